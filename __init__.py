@@ -1,62 +1,26 @@
 # -*- coding: utf-8 -*-
+import collections
+import importlib
 import logging
-import re
-import time
 import threading
 
+from flatland import Form, String
 from logging_helpers import _L
 from microdrop.interfaces import IPlugin
-from microdrop.plugin_helpers import hub_execute_async
+from microdrop.plugin_helpers import AppDataController, hub_execute_async
 from microdrop.plugin_manager import PluginGlobals, Plugin, implements
-from zmq_plugin.schema import decode_content_data
-import asyncio_helpers as ah
-import blinker
-import deepdiff
-import pandas as pd
-import trollius as asyncio
 
 from ._version import get_versions
-from .windows_joypad_interface import get_state
-
-
-@asyncio.coroutine
-def check_joypad(signals, joy_id, poll_interval=.001, settle_duration=.010, **kwargs):
-    start = time.time()
-    steady_state = {}
-    cre_button = re.compile(r"root\['button_states'\]\[(?P<button>\d+)\]")
-
-    while True:
-        try:
-            new_state = get_state(joy_id)
-        except IOError:
-            continue
-        now = time.time()
-        if new_state == steady_state:
-            start = now
-        else:
-            if (now - start) > settle_duration:
-                # State has stablized.
-                diff = deepdiff.DeepDiff(steady_state, new_state)
-                message = {'old': steady_state, 'new': new_state, 'diff': diff}
-
-                try:
-                    signals.signal('state-changed').send(message)
-                    # Send `buttons-changed` signal if buttons have changed state.
-                    # `buttons` property is a dictionary of new button states
-                    # (i.e., `<new_value>`) keyed by button number (old value not
-                    # included because it is implied by the fact that a state
-                    # changed occurred and the value is boolean).
-                    buttons = {int(cre_button.match(k).group('button')):
-                               v['new_value']
-                            for k, v in diff.get('values_changed', {}).items()
-                            if cre_button.match(k)}
-                    if buttons:
-                        message['buttons'] = buttons
-                        signals.signal('buttons-changed').send(message)
-                except Exception:
-                    _L().info('Error sending signals.', exc_info=True)
-                steady_state = new_state
-        yield asyncio.From(asyncio.sleep(poll_interval))
+from .backpressure import DirectionCoalescer, InFlightTracker
+from .batching import BatchExecutor, CommandBatch
+from .bindings import DEFAULT_BINDINGS, compile_bindings
+from .dispatch import SignalDispatcher
+from .gestures import GestureRecognizer
+from .history import EventHistory
+from .joypad_state import monotonic
+from .latency import LatencyTracker
+from .runner import EventLoopThread
+from .timers import AutoRepeat, TimerWheel
 
 
 __version__ = get_versions()['version']
@@ -67,137 +31,559 @@ logger = logging.getLogger(__name__)
 PluginGlobals.push_env('microdrop.managed')
 
 
-class JoypadControlPlugin(Plugin):
+class JoypadControlPlugin(Plugin, AppDataController):
     '''
     Trigger electrode state directional controls using a joypad.
 
      - Up, down, left, and right: corresponding directional control
-     - Button 0: clear all electrode states
-     - Button 3: actuate electrodes where liquid is detected
+     - Buttons: see :data:`bindings.DEFAULT_BINDINGS`, e.g., button 0 clears
+       all electrode states and button 3 actuates electrodes where liquid is
+       detected
+
+    Button bindings may be replaced through the ``button_bindings`` app
+    option, a JSON encoded binding table (see
+    :func:`bindings.compile_bindings`).
+
+    All joypads listed in :attr:`joy_ids` are serviced by a single poller
+    thread.  Each joypad may remap its physical buttons through
+    :attr:`button_mappings` (e.g., to use pads with different layouts at the
+    same bench).
+
+    Only modules needed to register the plugin are imported at load time;
+    the poller (and joypad backends) are imported when the plugin is
+    enabled, and modules only used by actions (see :attr:`preload_modules`)
+    are imported in the background after that.
     '''
     implements(IPlugin)
     version = __version__
     plugin_name = 'joypad_control_plugin'
 
+    AppFields = Form.of(
+        String.named('button_bindings').using(default='', optional=True),
+    )
+
+    #: Modules imported in the background once the plugin is enabled, so
+    #: the first action using them does not wait for the import.
+    preload_modules = ('pandas', 'zmq_plugin.schema')
+
     def __init__(self):
         self.name = self.plugin_name
-        self.signals = blinker.Namespace()
-        self.task = None
-        self._most_recent_message = {}
+        self._signals = None
+        #: Event loop thread running the joypad poller; the loop is kept
+        #: for the lifetime of the plugin.
+        self.poller = EventLoopThread()
+        #: Seconds to wait for each plugin thread to stop when disabled.
+        self.shutdown_timeout = 5.
+        self.enabled = False
+        self._lifecycle_lock = threading.RLock()
+        self.governor = None
+        self.dispatcher = None
+        #: Seconds between polls while joypad input is changing, and while
+        #: idle, i.e., after no input changed for `poll_idle_timeout` seconds
+        #: (see :class:`poller.PollRateGovernor`).
+        self.poll_interval = .001
+        self.poll_idle_interval = .02
+        self.poll_idle_timeout = 2.
+        #: Joypad backend (default: :func:`backends.get_backend`).
+        self.backend = None
+        #: Identifiers of joypads to monitor.
+        self.joy_ids = [0]
+        #: :class:`joypad_state.ButtonMapping` keyed by joypad identifier.
+        self.button_mappings = {}
+        #: Axis deadzone; axes are quantized to negative, neutral and
+        #: positive zones, so only zone transitions reach `_on_changed`.
+        self.deadzone = .4
+        #: Number of deflection levels beyond the deadzone (see
+        #: :class:`filters.AxisZoneFilter`); sets held direction repeat rate.
+        self.axis_levels = 4
+        #: Seconds a direction must be held before it starts repeating.
+        self.repeat_delay = .4
+        #: Held direction repeats per second at the first and the outermost
+        #: deflection level.
+        self.repeat_min_rate = 2.
+        self.repeat_max_rate = 10.
+        self.timers = None
+        self.repeater = None
+        self._resume_repeats = None
+        #: Maximum number of signals queued for the dispatch worker.
+        self.dispatch_queue_size = 64
+        #: Dispatch queue overflow policy (see
+        #: :class:`dispatch.SignalDispatcher`).
+        self.dispatch_overflow = 'coalesce'
+        #: Input-to-command latency histograms (see :meth:`get_latency_stats`).
+        self.latency = LatencyTracker()
+        #: Recent state changes of all joypads (see :meth:`get_history`).
+        self.history = EventHistory()
+        #: Hub commands awaiting a reply, keyed by target plugin.
+        self.in_flight = InFlightTracker()
+        #: Pending direction merge policy while the electrode controller is
+        #: busy (see :class:`backpressure.DirectionCoalescer`).
+        self.direction_policy = 'last'
+        #: Names of hub targets that implement
+        #: :data:`batching.BATCH_COMMAND`; commands generated by a single
+        #: input event for any other target are sent sequentially.
+        self.batch_targets = set()
+        #: Executes the commands generated by a single input event as one
+        #: hub transaction (see :class:`batching.BatchExecutor`).
+        self.batches = BatchExecutor(self._execute, self.batch_targets)
+        self.directions = None
+        #: Compiled button bindings (see :class:`bindings.BindingTable`).
+        self.binding_table = None
+        #: Seconds a button must be held for ``hold`` and ``long-press``
+        #: gestures, and maximum seconds between ``double-tap`` presses.
+        self.hold_duration = .5
+        self.double_tap_interval = .3
+        self.gestures = None
+
+    @property
+    def signals(self):
+        '''
+        Joypad signal namespace (created on first use).
+        '''
+        if self._signals is None:
+            import blinker
+
+            self._signals = blinker.Namespace()
+        return self._signals
+
+    def get_poll_metrics(self):
+        '''
+        Returns
+        -------
+        dict
+            Current joypad poll rate metrics (see
+            :meth:`poller.PollRateGovernor.metrics`), or empty dictionary if
+            the plugin is not enabled.
+        '''
+        return {} if self.governor is None else self.governor.metrics()
+
+    def get_dispatch_metrics(self):
+        '''
+        Returns
+        -------
+        dict
+            Current signal dispatch queue metrics (see
+            :meth:`dispatch.SignalDispatcher.metrics`), or empty dictionary
+            if the plugin is not enabled.
+        '''
+        return {} if self.dispatcher is None else self.dispatcher.metrics()
+
+    def get_backpressure_metrics(self):
+        '''
+        Returns
+        -------
+        dict
+            Hub commands in flight (see
+            :meth:`backpressure.InFlightTracker.metrics`), number of
+            direction commands ``coalesced`` while the electrode controller
+            was busy, and command ``batch`` metrics (see
+            :meth:`batching.BatchExecutor.metrics`).
+        '''
+        metrics = self.in_flight.metrics()
+        metrics['batch'] = self.batches.metrics()
+        metrics['coalesced'] = (0 if self.directions is None
+                                else self.directions.coalesced)
+        if self.repeater is not None:
+            metrics['repeat'] = self.repeater.metrics()
+        return metrics
+
+    def get_latency_stats(self):
+        '''
+        Returns
+        -------
+        dict
+            Latency summaries (in seconds) keyed by signal or command name,
+            then by stage (see :meth:`latency.LatencyTracker.summary`).
+
+            Stages are:
+
+             - ``sample_to_settle``: joypad sample to debounced state change.
+             - ``settle_to_dispatch``: debounced state change to signal.
+             - ``input_to_issue``: joypad sample to command issued to hub.
+             - ``round_trip``: command issued to hub reply received.
+        '''
+        return self.latency.summary()
+
+    def get_history(self, seconds=None, **kwargs):
+        '''
+        Parameters
+        ----------
+        seconds : float, optional
+            Only include state changes from the last :data:`seconds` seconds
+            (default: all changes still in history).
+        **kwargs
+            Additional filters, e.g., ``device_id`` or ``button`` (see
+            :meth:`history.EventHistory.query`).
+
+        Returns
+        -------
+        list
+            Recent state changes (see :data:`history.HistoryRecord`), oldest
+            first.
+        '''
+        if seconds is None:
+            return self.history.query(**kwargs)
+        return self.history.last(seconds, **kwargs)
+
+    def _execute(self, message, target, command, callback=None, token=None,
+                 **kwargs):
+        '''
+        Execute hub command in response to a joypad state change, recording
+        input-to-command and command round-trip latencies.
+
+        The command is tracked as in flight (see :attr:`in_flight`) until the
+        hub replies.
+
+        Parameters
+        ----------
+        message : joypad_state.StateChange or None
+            State change that triggered the command.
+        target : str
+            Name of plugin to execute command on.
+        command : str
+            Name of command.
+        callback : function, optional
+            Function to call with hub reply.
+        token : int, optional
+            Token of command, if already recorded as in flight (see
+            :meth:`backpressure.InFlightTracker.issue`).
+        **kwargs
+            Command arguments (see :func:`hub_execute_async`).
+        '''
+        name = '%s.%s' % (target, command)
+        issued = monotonic()
+        if message is not None and message.timestamp is not None:
+            self.latency.record(name, 'input_to_issue',
+                                issued - message.timestamp)
+        if token is None:
+            token = self.in_flight.issue(target, issued)
+
+        def _on_reply(zmq_response):
+            self.latency.record(name, 'round_trip', monotonic() - issued)
+            try:
+                if callback is not None:
+                    return callback(zmq_response)
+            finally:
+                self.in_flight.acknowledge(target, token)
+
+        return hub_execute_async(target, command, callback=_on_reply,
+                                 **kwargs)
+
+    def get_runtime_info(self):
+        '''
+        Returns
+        -------
+        dict
+            Whether the plugin is ``enabled``, liveness of the ``poller``
+            (loop thread ``alive`` and poller coroutine ``running``),
+            ``dispatcher`` and ``timers`` threads, and names of all active
+            joypad plugin ``threads``.
+        '''
+        return {'enabled': self.enabled,
+                'poller': {'alive': self.poller.is_alive(),
+                           'running': self.poller.running},
+                'dispatcher': (self.dispatcher is not None and
+                               self.dispatcher.is_alive()),
+                'timers': self.timers is not None and self.timers.is_alive(),
+                'threads': sorted(thread.name
+                                  for thread in threading.enumerate()
+                                  if thread.name.startswith('joypad-'))}
 
     def on_plugin_enable(self):
+        with self._lifecycle_lock:
+            if self.enabled:
+                _L().warning('Joypad poller is already running.')
+                return
+            if (self.poller.running and
+                    not self.poller.cancel(timeout=self.shutdown_timeout)):
+                # Previous poller did not stop when plugin was disabled.
+                _L().error('Previous joypad poller is still running; not '
+                           'starting another.')
+                return
+            AppDataController.on_plugin_enable(self)
+            self._start()
+            self.enabled = True
+            self._preload()
+
+    def _preload(self):
+        '''
+        Import :attr:`preload_modules` in a background thread.
+        '''
+        def _import():
+            for name in self.preload_modules:
+                try:
+                    importlib.import_module(name)
+                except ImportError:
+                    _L().warning('Error importing `%s`.', name, exc_info=True)
+
+        thread = threading.Thread(target=_import, name='joypad-preload')
+        thread.daemon = True
+        thread.start()
+
+    def on_plugin_disable(self):
+        with self._lifecycle_lock:
+            if not self.enabled:
+                return
+            self.enabled = False
+            self._stop()
+
+    def _load_bindings(self, actions, execute):
+        '''
+        Compile button bindings from ``button_bindings`` app option, falling
+        back to :data:`bindings.DEFAULT_BINDINGS` if not set or invalid.
+        '''
+        bindings = (self.get_app_values().get('button_bindings') or
+                    DEFAULT_BINDINGS)
+        try:
+            return compile_bindings(bindings, actions, execute)
+        except ValueError:
+            _L().error('Invalid button bindings; using defaults.',
+                       exc_info=True)
+            return compile_bindings(DEFAULT_BINDINGS, actions, execute)
+
+    def _start(self):
+        from .poller import PollRateGovernor, check_joypads
+
+        self.batches.targets = set(self.batch_targets)
         # Start joypad listener.
-        self.task = ah.cancellable(check_joypad)
+        self.governor = PollRateGovernor(self.poll_interval,
+                                         self.poll_idle_interval,
+                                         self.poll_idle_timeout)
         self.signals.clear()
+        # Signal receivers run on the dispatch worker thread, so slow
+        # receivers cannot stall joypad sampling.
+        self.dispatcher = SignalDispatcher(self.signals,
+                                           self.dispatch_queue_size,
+                                           self.dispatch_overflow)
+        # Merge direction commands while the electrode controller is busy, so
+        # they cannot pile up in the hub.
+        self.directions = DirectionCoalescer(self._execute, self.in_flight,
+                                             self.direction_policy)
+        # Repeat held directions from a single timer thread, holding repeats
+        # back while a direction command is still in flight.
+        self.timers = TimerWheel()
+        self.repeater = AutoRepeat(self.timers, self.repeat_delay,
+                                   self.repeat_min_rate, self.repeat_max_rate,
+                                   ready=lambda: not self.directions.busy)
+        directions = self.directions
+        repeater = self.repeater
 
-        liquid_state = {}
+        def _resume_repeats(target):
+            # Retry held back repeats once the electrode controller replies
+            # (after the coalescer has issued any pending direction).
+            if target == directions.target:
+                repeater.resume()
 
-        def _on_changed(message):
-            self._most_recent_message = message
+        self._resume_repeats = _resume_repeats
+        self.in_flight.add_listener(_resume_repeats)
 
-            if ((abs(message['new']['axes']['x']) > .4)  ^
-                (abs(message['new']['axes']['y']) > .4)):
+        # Liquid selection state of each joypad.
+        liquid_states = collections.defaultdict(dict)
 
+        execute = self._execute
+
+        # Axes are quantized to zones (see `filters.AxisZoneFilter`), so any
+        # axis beyond the deadzone is pressed, at any deflection level.
+        deadzone = self.deadzone
+
+        def _direction(axes):
+            if not ((abs(axes['x']) > deadzone) ^
+                    (abs(axes['y']) > deadzone)):
+                # Neither or both of **x** and **y** are pressed.
+                return None
+            if axes['x'] > deadzone:
+                # Right.
+                return 'right'
+            elif axes['x'] < -deadzone:
+                # Left.
+                return 'left'
+            elif axes['y'] > deadzone:
+                # Down.
+                return 'down'
+            else:
+                # Up.
+                return 'up'
+
+        def _magnitude(axes):
+            # Deflection beyond the deadzone, scaled to `[0, 1]`.
+            value = max(abs(axes['x']), abs(axes['y']))
+            return min(1., max(0., (value - self.deadzone) /
+                               (.5 - self.deadzone)))
+
+        def _on_changed(message):
+            self.history.append(message)
+            if message.settled is not None:
+                if message.timestamp is not None:
+                    self.latency.record('state-changed', 'sample_to_settle',
+                                        message.settled - message.timestamp)
+                if message.dispatched is not None:
+                    self.latency.record('state-changed', 'settle_to_dispatch',
+                                        message.dispatched - message.settled)
+            if not any(message.axis_deltas):
+                # Only buttons changed.
+                return
+            axes = message['new']['axes']
+            direction = _direction(axes)
+            repeat_key = message['device_id']
+
+            if direction is None:
+                # Stick released (or diagonal).
+                self.repeater.release(repeat_key)
+            elif direction == _direction(message['old'].get('axes') or
+                                         {'x': 0., 'y': 0.}):
+                # Only deflection changed; update repeat rate.
+                self.repeater.update(repeat_key, _magnitude(axes))
+            else:
                 # Either **x** or **y** (_not_ both) is pressed.
-                if message['new']['axes']['x'] > .4:
-                    # Right.
-                    direction = 'right'
-                elif message['new']['axes']['x'] < -.4:
-                    # Left.
-                    direction = 'left'
-                if message['new']['axes']['y'] > .4:
-                    # Down.
-                    direction = 'down'
-                elif message['new']['axes']['y'] < -.4:
-                    # Up.
-                    direction = 'up'
-
-                if all((direction in ('right', 'left'), liquid_state,
-                        message['new']['button_states'][3])):
-                    electrodes = liquid_state['electrodes']
-
-                    if 'i' in liquid_state:
-                        i = liquid_state['i'] + (1 if direction == 'right'
-                                                 else -1)
-                    else:
-                        i = (0 if direction == 'right'
-                             else len(electrodes) - 1)
-                    i = i % len(electrodes)
-                    hub_execute_async('dropbot_plugin', 'identify_electrode',
-                                      electrode_id=electrodes[i])
+                self.repeater.release(repeat_key)
+                if not self.gestures.direction(message, direction):
+                    # No held button handled the direction (see
+                    # `hold-direction` bindings).
+                    self.directions.move(direction, message)
+                    self.repeater.hold(repeat_key, _magnitude(axes),
+                                       lambda: self.directions
+                                       .move(direction))
+
+        def _clear_electrode_states(message):
+            execute(message, 'microdrop.electrode_controller_plugin',
+                    'clear_electrode_states')
+
+        def _find_liquid(message):
+            liquid_state = liquid_states[message['device_id']]
+            i = liquid_state.get('i')
+            liquid_state.clear()
+
+            def _on_found(zmq_response):
+                from zmq_plugin.schema import decode_content_data
+
+                data = decode_content_data(zmq_response)
+                liquid_state['electrodes'] = data
+                if i is not None and i < len(liquid_state['electrodes']):
                     liquid_state['i'] = i
-                else:
-                    hub_execute_async('microdrop.electrode_controller_plugin',
-                                      'set_electrode_direction_states',
-                                      direction=direction)
+
+            execute(message, 'dropbot_plugin', 'find_liquid',
+                    callback=_on_found)
+
+        def _select_liquid(message, step):
+            liquid_state = liquid_states[message['device_id']]
+            if 'electrodes' not in liquid_state:
+                # Liquid not found (yet); move electrodes instead.
+                return False
+            electrodes = liquid_state['electrodes']
+
+            if 'i' in liquid_state:
+                i = liquid_state['i'] + step
+            else:
+                i = 0 if step > 0 else len(electrodes) - 1
+            i = i % len(electrodes)
+            execute(message, 'dropbot_plugin', 'identify_electrode',
+                    electrode_id=electrodes[i])
+            liquid_state['i'] = i
+
+        def _actuate_liquid(message):
+            liquid_state = liquid_states[message['device_id']]
+            _L().info('Button 3 was released. `%s`', liquid_state)
+            i = liquid_state.get('i')
+            if i is not None:
+                import pandas as pd
+
+                selected_electrode = liquid_state['electrodes'][i]
+                electrode_states = pd.Series(1, index=[selected_electrode])
+                # Clear and set in a single transaction (if the electrode
+                # controller is listed in `batch_targets`), so electrodes
+                # are never all off in between.
+                batch = CommandBatch('microdrop.electrode_controller_plugin')
+                batch.add('clear_electrode_states')
+                batch.add('set_electrode_states',
+                          electrode_states=electrode_states)
+                self.batches(message, batch)
+
+        def _protocol_action(command):
+            def _action(message):
+                execute(message, 'microdrop.gui.protocol_controller', command)
+            return _action
+
+        actions = {'clear_electrode_states': _clear_electrode_states,
+                   'find_liquid': _find_liquid,
+                   'select_prev_liquid': lambda message:
+                   _select_liquid(message, -1),
+                   'select_next_liquid': lambda message:
+                   _select_liquid(message, 1),
+                   'actuate_liquid': _actuate_liquid}
+        for command in ('first_step', 'prev_step', 'next_step', 'last_step',
+                        'run_protocol'):
+            actions[command] = _protocol_action(command)
+        self.binding_table = self._load_bindings(actions, execute)
+        binding_table = self.binding_table
+        # Long-press, hold and double-tap timeouts share the timer wheel.
+        self.gestures = GestureRecognizer(binding_table, self.timers,
+                                          self.hold_duration,
+                                          self.double_tap_interval,
+                                          self.signals.signal('gesture'))
+        gestures = self.gestures
 
         def _on_buttons_changed(message):
-            if message['buttons'] == {0: True}:
-                # Button 0 was pressed.
-                hub_execute_async('microdrop.electrode_controller_plugin',
-                                  'clear_electrode_states')
-            elif message['buttons'] == {3: True}:
-                # Button 3 was pressed.
-                i = liquid_state.get('i')
-                liquid_state.clear()
-
-                def _on_found(zmq_response):
-                    data = decode_content_data(zmq_response)
-                    liquid_state['electrodes'] = data
-                    if i is not None and i < len(liquid_state['electrodes']):
-                        liquid_state['i'] = i
-
-                hub_execute_async('dropbot_plugin', 'find_liquid',
-                                  callback=_on_found)
-            elif message['buttons'] == {3: False}:
-                # Button 3 was released.
-                _L().info('Button 3 was released. `%s`', liquid_state)
-                i = liquid_state.get('i')
-                if i is not None:
-                    selected_electrode = liquid_state['electrodes'][i]
-                    electrode_states = pd.Series(1, index=[selected_electrode])
-                    hub_execute_async('microdrop.electrode_controller_plugin',
-                                      'clear_electrode_states')
-                    hub_execute_async('microdrop.electrode_controller_plugin',
-                                      'set_electrode_states',
-                                      electrode_states=electrode_states)
-            elif message['buttons'] == {4: True}:
-                # Button 4 was pressed.
-                if message['new']['button_states'][8]:
-                    # Button 8 was also held down.
-                    hub_execute_async('microdrop.gui.protocol_controller',
-                                      'first_step')
-                else:
-                    hub_execute_async('microdrop.gui.protocol_controller',
-                                      'prev_step')
-            elif message['buttons'] == {5: True}:
-                # Button 5 was pressed.
-                if message['new']['button_states'][8]:
-                    # Button 8 was also held down.
-                    hub_execute_async('microdrop.gui.protocol_controller',
-                                      'last_step')
-                else:
-                    hub_execute_async('microdrop.gui.protocol_controller',
-                                      'next_step')
-            elif message['buttons'] == {9: True}:
-                # Button 9 was pressed.
-                hub_execute_async('microdrop.gui.protocol_controller',
-                                  'run_protocol')
+            gestures.update(message)
+            binding = binding_table.match(message)
+            if binding is not None:
+                binding(message)
             elif all(message['buttons'].values()):
                 _L().info('%s', message)
 
+        def _on_device_connected(message):
+            _L().info('Joypad %d connected.', message['device_id'])
+
+        def _on_device_disconnected(message):
+            _L().info('Joypad %d disconnected.', message['device_id'])
+            self.repeater.release(message['device_id'])
+
+        self.signals.signal('device-connected').connect(_on_device_connected,
+                                                        weak=False)
+        self.signals.signal('device-disconnected')\
+            .connect(_on_device_disconnected, weak=False)
         self.signals.signal('state-changed').connect(_on_changed, weak=False)
         self.signals.signal('buttons-changed').connect(_on_buttons_changed,
                                                        weak=False)
-        thread = threading.Thread(target=self.task, args=(self.signals, 0))
-        thread.daemon = True
-        thread.start()
+        self.timers.start()
+        self.dispatcher.start()
+        if not self.poller.is_alive():
+            self.poller.start()
+        self.poller.run(check_joypads, self.signals, list(self.joy_ids),
+                        backend=self.backend, governor=self.governor,
+                        dispatcher=self.dispatcher,
+                        mappings=dict(self.button_mappings),
+                        deadzone=self.deadzone, axis_levels=self.axis_levels)
 
-    def on_plugin_disable(self):
-        # Stop joypad listener.
-        if self.task is not None:
-            self.task.cancel()
-            self.task = None
+    def _stop(self):
+        timeout = self.shutdown_timeout
+        if self.dispatcher is not None:
+            # Discard queued signals and release the poller if it is blocked
+            # on a full queue (`'block'` overflow policy), so it can be
+            # cancelled.
+            self.dispatcher.stop(0)
+        # Stop joypad listener, and wait for it to close devices.
+        if not self.poller.cancel(timeout=timeout):
+            _L().warning('Timed out waiting for joypad poller to stop.')
+        if self.dispatcher is not None:
+            if not self.dispatcher.stop(timeout):
+                _L().warning('Timed out waiting for joypad signal dispatcher '
+                             'to stop.')
+            self.dispatcher = None
+        if self.timers is not None:
+            self.in_flight.remove_listener(self._resume_repeats)
+            self._resume_repeats = None
+            self.repeater.release_all()
+            if not self.timers.stop(timeout):
+                _L().warning('Timed out waiting for joypad timers to stop.')
+            self.timers = None
+            self.repeater = None
+        if self.directions is not None:
+            self.directions.close()
+            self.directions = None
+        if self.gestures is not None:
+            self.gestures.reset()
+            self.gestures = None
+        self.governor = None
         self.signals.clear()
 
 
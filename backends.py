@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import importlib
+import sys
+
+
+class JoypadDevice(object):
+    '''
+    Open joypad device.
+
+    Attributes
+    ----------
+    device_id : int
+        Device identifier (see :meth:`JoypadBackend.enumerate`).
+    state : joypad_state.JoypadState or None
+        Most recent state, or ``None`` if the device has not been read
+        successfully yet.
+    '''
+    __slots__ = ()
+
+    def read(self):
+        '''
+        Read pending input from device.
+
+        Polling devices sample the current device state.  Event-driven
+        devices consume all pending events without blocking.
+
+        Returns
+        -------
+        bool
+            ``True`` if :attr:`state` was updated.
+
+        Raises
+        ------
+        IOError
+            If device is no longer available (e.g., unplugged).
+        '''
+        raise NotImplementedError
+
+    def close(self):
+        '''
+        Release any resources held by device.
+        '''
+        pass
+
+
+class JoypadBackend(object):
+    '''
+    Source of joypad devices.
+
+    Polling backends (:attr:`event_driven` is ``False``) must be read
+    periodically.  Devices opened by event-driven backends also implement
+    ``fileno()``, which becomes readable when input is pending.
+    '''
+    #: ``True`` if devices provide a ``fileno()`` to wait on for input.
+    event_driven = False
+
+    def enumerate(self):
+        '''
+        Returns
+        -------
+        list
+            Identifiers of available devices.
+        '''
+        raise NotImplementedError
+
+    def is_available(self, device_id):
+        '''
+        Check whether device is available (e.g., plugged in) without opening
+        it.  Backends should override this with a cheaper check where
+        possible.
+
+        Parameters
+        ----------
+        device_id : int
+            Device identifier.
+
+        Returns
+        -------
+        bool
+        '''
+        return device_id in self.enumerate()
+
+    def open(self, device_id):
+        '''
+        Parameters
+        ----------
+        device_id : int
+            Device identifier.
+
+        Returns
+        -------
+        JoypadDevice
+            Open device.
+
+        Raises
+        ------
+        IOError
+            If device is not available.
+        '''
+        raise NotImplementedError
+
+
+#: Available backends, as ``(module, class name)`` keyed by backend name.
+#: Backend modules are only imported when the backend is requested, since
+#: they depend on platform-specific modules.
+BACKENDS = {'winmm': ('.windows_joypad_interface', 'WinMMBackend'),
+            'joydev': ('.linux_joypad_interface', 'JoydevBackend'),
+            'evdev': ('.linux_joypad_interface', 'EvdevBackend'),
+            'replay': ('.joypad_trace', 'ReplayBackend')}
+
+
+def default_backend_name():
+    '''
+    Returns
+    -------
+    str
+        Name of default backend for current platform.
+    '''
+    return 'winmm' if sys.platform == 'win32' else 'joydev'
+
+
+def get_backend(name=None, **kwargs):
+    '''
+    Create joypad backend.
+
+    Parameters
+    ----------
+    name : str, optional
+        Backend name (see :data:`BACKENDS`).  If not specified, use default
+        backend for current platform.
+    **kwargs
+        Keyword arguments passed to backend constructor.
+
+    Returns
+    -------
+    JoypadBackend
+    '''
+    if name is None:
+        name = default_backend_name()
+    try:
+        module_name, class_name = BACKENDS[name]
+    except KeyError:
+        raise ValueError('Unknown joypad backend `%s`.  Available backends: %s'
+                         % (name, ', '.join(sorted(BACKENDS))))
+    module = importlib.import_module(module_name,
+                                     __name__.rpartition('.')[0])
+    return getattr(module, class_name)(**kwargs)
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+import collections
+import itertools
+import threading
+
+from .joypad_state import monotonic
+
+#: Available pending direction merge policies (see
+#: :class:`DirectionCoalescer`).
+COALESCE_POLICIES = ('last', 'sum')
+
+#: ``(x, y)`` electrode step of each direction.
+DIRECTION_STEPS = {'right': (1, 0), 'left': (-1, 0), 'down': (0, 1),
+                   'up': (0, -1)}
+
+
+class InFlightTracker(object):
+    '''
+    Track hub commands that have been issued but not yet acknowledged, per
+    hub target (i.e., plugin name).
+
+    Commands without a reply after :attr:`timeout` seconds are assumed lost,
+    so a dropped reply cannot block a target forever.  Each command is
+    identified by the token returned by :meth:`issue`, so a late reply to
+    an expired command cannot acknowledge a newer command.
+
+    Parameters
+    ----------
+    timeout : float, optional
+        Seconds to wait for a reply before a command is no longer considered
+        in flight.
+    '''
+    def __init__(self, timeout=2.):
+        self.timeout = timeout
+        # Issue time keyed by token, oldest first, keyed by target.
+        self._issued = collections.defaultdict(collections.OrderedDict)
+        self._tokens = itertools.count()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.expired = 0
+        #: Number of replies received after their command expired.
+        self.late = 0
+
+    def add_listener(self, callback):
+        '''
+        Parameters
+        ----------
+        callback : function
+            Called with target name each time a command to the target is
+            acknowledged.
+        '''
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def issue(self, target, now=None):
+        '''
+        Record command to target as in flight.
+
+        Returns
+        -------
+        int
+            Token identifying command (see :meth:`acknowledge`).
+        '''
+        if now is None:
+            now = monotonic()
+        with self._lock:
+            token = next(self._tokens)
+            self._issued[target][token] = now
+        return token
+
+    def acknowledge(self, target, token):
+        '''
+        Record reply to command.
+
+        Parameters
+        ----------
+        target : str
+            Name of target plugin.
+        token : int
+            Token returned by :meth:`issue` for command.  Replies to expired
+            commands are ignored.
+        '''
+        with self._lock:
+            if self._issued[target].pop(token, None) is None:
+                self.late += 1
+        for callback in self._listeners:
+            callback(target)
+
+    def _expire(self, issued, now):
+        while issued:
+            token, issued_at = next(iter(issued.items()))
+            if now - issued_at <= self.timeout:
+                break
+            del issued[token]
+            self.expired += 1
+
+    def count(self, target, now=None):
+        '''
+        Returns
+        -------
+        int
+            Number of commands in flight to target.
+        '''
+        if now is None:
+            now = monotonic()
+        with self._lock:
+            issued = self._issued[target]
+            self._expire(issued, now)
+            return len(issued)
+
+    def busy(self, target, now=None):
+        '''
+        Returns
+        -------
+        bool
+            ``True`` if any command to target is in flight.
+        '''
+        return self.count(target, now) > 0
+
+    def metrics(self):
+        '''
+        Returns
+        -------
+        dict
+            Number of commands in flight keyed by target, number of
+            ``expired`` commands (i.e., not acknowledged in time), and
+            number of ``late`` replies to expired commands.
+        '''
+        now = monotonic()
+        with self._lock:
+            in_flight = {}
+            for target, issued in self._issued.items():
+                self._expire(issued, now)
+                in_flight[target] = len(issued)
+        return {'in_flight': in_flight, 'expired': self.expired,
+                'late': self.late}
+
+
+class DirectionCoalescer(object):
+    '''
+    Issue electrode direction commands without outrunning the electrode
+    controller.
+
+    While a direction command to :attr:`target` is in flight, new directions
+    are merged into a single pending command, which is issued once the
+    target acknowledges the previous command.  At most one direction command
+    is therefore queued in the hub at a time.
+
+    Parameters
+    ----------
+    execute : function
+        Called as ``execute(message, target, command, token=...,
+        direction=...)`` to issue a command.  The command is already
+        recorded as in flight in :data:`tracker` under ``token``;
+        :data:`execute` must acknowledge it once the target replies.
+    tracker : InFlightTracker
+        Commands in flight.
+    policy : str, optional
+        How pending directions are merged:
+
+         - ``'last'``: most recent direction wins, i.e., at most one step
+           is issued once the target is ready.
+         - ``'sum'``: steps are summed (opposite directions cancel) and
+           issued one at a time, each after the previous is acknowledged.
+    target : str, optional
+        Name of plugin to send direction commands to.
+    command : str, optional
+        Name of direction command.
+
+    Attributes
+    ----------
+    coalesced : int
+        Number of directions merged into a pending command.
+    '''
+    def __init__(self, execute, tracker, policy='last',
+                 target='microdrop.electrode_controller_plugin',
+                 command='set_electrode_direction_states'):
+        if policy not in COALESCE_POLICIES:
+            raise ValueError('Unknown coalesce policy `%s`.  Available '
+                             'policies: %s' % (policy,
+                                               ', '.join(COALESCE_POLICIES)))
+        self.execute = execute
+        self.tracker = tracker
+        self.policy = policy
+        self.target = target
+        self.command = command
+        self.coalesced = 0
+        self._pending = None
+        self._steps = [0, 0]
+        self._lock = threading.Lock()
+        tracker.add_listener(self._on_acknowledged)
+
+    def close(self):
+        '''
+        Discard pending directions and stop listening to :attr:`tracker`.
+        '''
+        self.clear()
+        self.tracker.remove_listener(self._on_acknowledged)
+
+    @property
+    def pending(self):
+        '''
+        ``True`` if a direction is waiting for the target to be ready.
+        '''
+        return self._pending is not None or any(self._steps)
+
+    @property
+    def busy(self):
+        '''
+        ``True`` if a direction command is in flight or pending, i.e., new
+        directions will be coalesced rather than issued.
+
+        A pending direction is issued first if the target is ready, e.g.,
+        because the command in flight expired without a reply (expiry does
+        not notify :attr:`tracker` listeners).
+        '''
+        if self.pending:
+            self.flush()
+        return self.pending or self.tracker.busy(self.target)
+
+    def clear(self):
+        '''
+        Discard pending directions.
+        '''
+        with self._lock:
+            self._pending = None
+            self._steps = [0, 0]
+
+    def move(self, direction, message=None):
+        '''
+        Issue direction command, or merge into pending command if the target
+        is busy.
+
+        Parameters
+        ----------
+        direction : str
+            One of ``'up'``, ``'down'``, ``'left'`` or ``'right'``.
+        message : joypad_state.StateChange, optional
+            State change that triggered the move.
+
+        Returns
+        -------
+        bool
+            ``True`` if the command was issued immediately.
+        '''
+        with self._lock:
+            if self.pending:
+                self.coalesced += 1
+            if self.policy == 'sum':
+                dx, dy = DIRECTION_STEPS[direction]
+                self._steps[0] += dx
+                self._steps[1] += dy
+            else:
+                self._pending = (direction, message)
+        return self.flush()
+
+    def flush(self):
+        '''
+        Issue pending direction if the target is ready.
+
+        Returns
+        -------
+        bool
+            ``True`` if a command was issued.
+        '''
+        with self._lock:
+            if self.tracker.busy(self.target):
+                return False
+            if self.policy == 'sum':
+                dx, dy = self._steps
+                if abs(dx) >= abs(dy) and dx:
+                    direction = 'right' if dx > 0 else 'left'
+                    self._steps[0] -= 1 if dx > 0 else -1
+                elif dy:
+                    direction = 'down' if dy > 0 else 'up'
+                    self._steps[1] -= 1 if dy > 0 else -1
+                else:
+                    return False
+                message = None
+            elif self._pending is not None:
+                direction, message = self._pending
+                self._pending = None
+            else:
+                return False
+            # Mark target busy before releasing lock, so concurrent flushes
+            # cannot issue a second command.
+            token = self.tracker.issue(self.target)
+        self.execute(message, self.target, self.command, token=token,
+                     direction=direction)
+        return True
+
+    def _on_acknowledged(self, target):
+        if target == self.target:
+            self.flush()
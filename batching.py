@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#: Name of hub command that executes a batch of commands as a single
+#: transaction (see :class:`BatchExecutor`).
+BATCH_COMMAND = 'execute_batch'
+
+
+class CommandBatch(object):
+    '''
+    Hub commands generated by a single input event for a single target.
+
+    Parameters
+    ----------
+    target : str
+        Name of plugin to execute commands on.
+    '''
+    def __init__(self, target):
+        self.target = target
+        self.commands = []
+
+    def __len__(self):
+        return len(self.commands)
+
+    def add(self, command, **kwargs):
+        '''
+        Append command to batch.
+
+        Parameters
+        ----------
+        command : str
+            Name of command.
+        **kwargs
+            Command arguments.
+
+        Returns
+        -------
+        CommandBatch
+            This batch (to allow chaining).
+        '''
+        self.commands.append((command, kwargs))
+        return self
+
+
+class BatchExecutor(object):
+    '''
+    Execute command batches as a single hub transaction.
+
+    A batch for one of :attr:`targets` is sent as one :data:`BATCH_COMMAND`
+    request with the list of commands, so the target applies all of them
+    before replying (e.g., no intermediate state where all electrodes are
+    off between ``clear_electrode_states`` and ``set_electrode_states``),
+    and there is a single round trip and reply to correlate.
+
+    Batches for any other target are executed as sequential commands, so
+    targets must be declared explicitly to be sent :data:`BATCH_COMMAND`.
+
+    Parameters
+    ----------
+    execute : function
+        Called as ``execute(message, target, command, callback=None,
+        **kwargs)`` to issue a hub command (see
+        :meth:`JoypadControlPlugin._execute`).
+    targets : set, optional
+        Names of targets that implement :data:`BATCH_COMMAND`.
+    '''
+    def __init__(self, execute, targets=None):
+        self.execute = execute
+        self.targets = set() if targets is None else set(targets)
+        #: Number of batches sent as a single transaction.
+        self.batches = 0
+        #: Number of batches of more than one command executed as sequential
+        #: commands.
+        self.sequential = 0
+
+    def __call__(self, message, batch, callback=None):
+        '''
+        Parameters
+        ----------
+        message : joypad_state.StateChange or None
+            State change that generated the batch.
+        batch : CommandBatch
+            Commands to execute.
+        callback : function, optional
+            Called with hub reply to the batch (or, if executed as
+            sequential commands, to the last command).
+        '''
+        if not batch.commands:
+            return
+        if len(batch) == 1 or batch.target not in self.targets:
+            self._execute_sequential(message, batch, callback)
+            return
+        self.batches += 1
+        self.execute(message, batch.target, BATCH_COMMAND, callback=callback,
+                     commands=[{'command': command, 'kwargs': kwargs}
+                               for command, kwargs in batch.commands])
+
+    def _execute_sequential(self, message, batch, callback):
+        if len(batch) > 1:
+            self.sequential += 1
+        last = len(batch) - 1
+        for i, (command, kwargs) in enumerate(batch.commands):
+            self.execute(message, batch.target, command,
+                         callback=callback if i == last else None, **kwargs)
+
+    def metrics(self):
+        '''
+        Returns
+        -------
+        dict
+            Number of ``batches`` sent as a single transaction, number of
+            batches executed as ``sequential`` commands, and names of batch
+            capable ``targets``.
+        '''
+        return {'batches': self.batches, 'sequential': self.sequential,
+                'targets': sorted(self.targets)}
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+import json
+
+from .joypad_state import iter_bits
+
+#: Default button bindings (see :func:`compile_bindings`).
+DEFAULT_BINDINGS = [
+    {'buttons': [0], 'on': 'press', 'action': 'clear_electrode_states'},
+    {'buttons': [3], 'on': 'press', 'action': 'find_liquid'},
+    {'buttons': [3], 'on': 'hold-direction', 'direction': 'left',
+     'action': 'select_prev_liquid'},
+    {'buttons': [3], 'on': 'hold-direction', 'direction': 'right',
+     'action': 'select_next_liquid'},
+    {'buttons': [3], 'on': 'release', 'action': 'actuate_liquid'},
+    {'buttons': [4], 'on': 'press', 'action': 'prev_step'},
+    {'buttons': [4], 'on': 'press', 'modifiers': [8],
+     'action': 'first_step'},
+    {'buttons': [5], 'on': 'press', 'action': 'next_step'},
+    {'buttons': [5], 'on': 'press', 'modifiers': [8], 'action': 'last_step'},
+    {'buttons': [9], 'on': 'press', 'action': 'run_protocol'},
+]
+
+#: Button edge of each binding event name.
+EDGES = {'press': True, 'release': False}
+
+#: Gesture binding event names (see :class:`gestures.GestureRecognizer`).
+GESTURES = ('hold', 'long-press', 'double-tap', 'hold-direction')
+
+#: Directions of ``hold-direction`` gestures.
+DIRECTIONS = ('up', 'down', 'left', 'right')
+
+
+def button_mask(buttons):
+    '''
+    Parameters
+    ----------
+    buttons : int or list
+        Button number(s).
+
+    Returns
+    -------
+    int
+        Button mask.
+    '''
+    if isinstance(buttons, int):
+        buttons = [buttons]
+    mask = 0
+    for b in buttons:
+        mask |= 1 << int(b)
+    return mask
+
+
+def gesture_key(gesture, button, direction=None):
+    '''
+    Returns
+    -------
+    int
+        Integer key combining button, gesture and direction.
+    '''
+    return ((button << 6) | (GESTURES.index(gesture) << 3) |
+            (0 if direction is None else DIRECTIONS.index(direction) + 1))
+
+
+def popcount(mask):
+    '''
+    Returns
+    -------
+    int
+        Number of set bits in mask.
+    '''
+    return bin(mask).count('1')
+
+
+class Binding(object):
+    '''
+    Compiled button binding.
+
+    Attributes
+    ----------
+    buttons : int
+        Mask of chord buttons, i.e., buttons that must all be held.
+    on : str
+        Event name, i.e., ``'press'``, ``'release'``, or a gesture (see
+        :data:`GESTURES`).
+    pressed : bool or None
+        ``True`` to trigger when buttons are pressed, ``False`` when
+        released (``None`` for gestures).
+    direction : str or None
+        Direction of ``hold-direction`` gesture.
+    modifiers : int
+        Mask of buttons that must already be held.
+    action : str
+        Action name.
+    handler : function
+        Called as ``handler(message, **args)`` when binding is triggered.
+    args : dict
+        Additional action keyword arguments.
+    '''
+    __slots__ = ('buttons', 'on', 'pressed', 'direction', 'modifiers',
+                 'action', 'handler', 'args')
+
+    def __init__(self, buttons, on, modifiers, action, handler, args,
+                 direction=None):
+        self.buttons = buttons
+        self.on = on
+        self.pressed = EDGES.get(on)
+        self.direction = direction
+        self.modifiers = modifiers
+        self.action = action
+        self.handler = handler
+        self.args = args
+
+    def __repr__(self):
+        return ('<Binding buttons=%#x on=%s modifiers=%#x action=%r>' %
+                (self.buttons, self.on if self.direction is None else
+                 '%s:%s' % (self.on, self.direction), self.modifiers,
+                 self.action))
+
+    def __call__(self, message):
+        return self.handler(message, **self.args)
+
+
+class BindingTable(object):
+    '''
+    Match button events against chord and modifier bindings.
+
+    A press binding is triggered when one of its buttons is pressed while
+    all of its buttons (i.e., the chord) are held and its modifiers were
+    already held.  A release binding is triggered when one of its buttons is
+    released after the whole chord was held, while its modifiers are still
+    held.  If several bindings match, the most specific wins, i.e., the one
+    with the most chord and modifier buttons (then the most chord buttons,
+    then the first listed).  For example, with bindings for button 4 and
+    for button 4 with modifier 8, pressing 4 while 8 is held only triggers
+    the latter.
+
+    All tests are bitmask subset tests against the held button masks
+    before and after the change.  Candidates are indexed by button and the
+    result for each ``(old, new)`` held mask pair is memoized, so matching
+    is O(1) per event (amortized), for any number of buttons.
+
+    Gesture bindings (see :data:`GESTURES`) are not matched against state
+    changes; they are kept in :attr:`gestures`, keyed by
+    :func:`gesture_key`, for :class:`gestures.GestureRecognizer`.
+
+    Parameters
+    ----------
+    bindings : list
+        Compiled :class:`Binding` objects.
+    cache_size : int, optional
+        Maximum number of memoized held mask pairs.
+    '''
+    def __init__(self, bindings, cache_size=4096):
+        self.bindings = list(bindings)
+        self.cache_size = cache_size
+        self._cache = {}
+        # Candidate bindings keyed by `(button, pressed)`, most specific
+        # first.
+        self._candidates = {}
+        #: Gesture bindings keyed by :func:`gesture_key`.
+        self.gestures = {}
+        #: Mask of buttons with bindings, keyed by gesture name.
+        self.gesture_masks = dict((gesture, 0) for gesture in GESTURES)
+        seen = {}
+        for order, binding in enumerate(self.bindings):
+            key = (binding.buttons, binding.on, binding.direction,
+                   binding.modifiers)
+            if key in seen:
+                raise ValueError('Duplicate binding: %r and %r' %
+                                 (seen[key], binding))
+            seen[key] = binding
+            if binding.pressed is None:
+                button = next(iter_bits(binding.buttons))
+                self.gestures[gesture_key(binding.on, button,
+                                          binding.direction)] = binding
+                self.gesture_masks[binding.on] |= binding.buttons
+                continue
+            rank = (-popcount(binding.buttons | binding.modifiers),
+                    -popcount(binding.buttons), order)
+            for b in iter_bits(binding.buttons):
+                self._candidates.setdefault((b, binding.pressed), [])\
+                    .append((rank, binding))
+        for candidates in self._candidates.values():
+            candidates.sort(key=lambda candidate: candidate[0])
+
+    def __len__(self):
+        return len(self.bindings)
+
+    def lookup(self, old, new):
+        '''
+        Parameters
+        ----------
+        old : int
+            Mask of buttons held before change.
+        new : int
+            Mask of buttons held after change.
+
+        Returns
+        -------
+        Binding or None
+            Most specific binding triggered by change, if any.
+        '''
+        key = (old, new)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        binding = self._match(old, new)
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[key] = binding
+        return binding
+
+    def _match(self, old, new):
+        best = None
+        best_rank = None
+        # Modifiers must be held both before and after change.
+        held = old & new
+        for b in iter_bits(old ^ new):
+            pressed = bool(new & (1 << b))
+            # Chord must be held after press, or before release.
+            chord_held = new if pressed else old
+            for rank, binding in self._candidates.get((b, pressed), ()):
+                if (binding.buttons & chord_held == binding.buttons and
+                        binding.modifiers & held == binding.modifiers):
+                    # Candidates are sorted, so first match is the most
+                    # specific for this button.
+                    if best is None or rank < best_rank:
+                        best, best_rank = binding, rank
+                    break
+        return best
+
+    def match(self, message):
+        '''
+        Parameters
+        ----------
+        message : joypad_state.StateChange
+            State change.
+
+        Returns
+        -------
+        Binding or None
+            Binding triggered by state change, if any.
+        '''
+        if not message.changed:
+            return None
+        old = 0 if message.old is None else message.old.buttons
+        return self.lookup(old, message.new.buttons)
+
+
+def compile_bindings(bindings, actions, execute=None):
+    '''
+    Compile declarative binding table.
+
+    Parameters
+    ----------
+    bindings : list or str
+        Binding entries (or JSON encoded list of entries).  Each entry is a
+        dictionary with:
+
+         - ``buttons``: button number or list of button numbers (i.e., a
+           chord).
+         - ``on`` (optional): ``'press'`` (default), ``'release'``, or a
+           single button gesture: ``'hold'``, ``'long-press'``,
+           ``'double-tap'`` or ``'hold-direction'`` (see
+           :class:`gestures.GestureRecognizer`).
+         - ``direction`` (``hold-direction`` only): ``'up'``, ``'down'``,
+           ``'left'`` or ``'right'``.
+         - ``modifiers`` (optional, not for gestures): list of buttons that
+           must be held.
+         - ``action``: name of action in :data:`actions`, or
+           ``'<plugin>:<command>'`` to execute a hub command.
+         - ``args`` (optional): additional action keyword arguments.
+    actions : dict
+        Action handlers keyed by name.  Each handler is called as
+        ``handler(message, **args)``.
+    execute : function, optional
+        Called as ``execute(message, target, command, **args)`` for
+        ``'<plugin>:<command>'`` actions.
+
+    Returns
+    -------
+    BindingTable
+        Compiled bindings.
+
+    Raises
+    ------
+    ValueError
+        If an entry is invalid, refers to an unknown action, or duplicates
+        another entry.
+    '''
+    if not isinstance(bindings, (list, tuple)):
+        bindings = json.loads(bindings)
+    compiled = []
+    for entry in bindings:
+        try:
+            buttons = button_mask(entry['buttons'])
+            on = entry.get('on', 'press')
+            direction = entry.get('direction')
+            modifiers = button_mask(entry.get('modifiers', []))
+            action = entry['action']
+            args = dict(entry.get('args', {}))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Invalid binding: %r' % (entry, ))
+        if not buttons or buttons & modifiers:
+            raise ValueError('Invalid binding buttons: %r' % (entry, ))
+        if on in GESTURES:
+            if popcount(buttons) != 1 or modifiers:
+                raise ValueError('Gesture bindings must have a single button '
+                                 'and no modifiers: %r' % (entry, ))
+            if (on == 'hold-direction') != (direction in DIRECTIONS):
+                raise ValueError('Invalid binding direction: %r' % (entry, ))
+        elif on not in EDGES or direction is not None:
+            raise ValueError('Invalid binding event: %r' % (entry, ))
+        if action in actions:
+            handler = actions[action]
+        elif ':' in action and execute is not None:
+            target, command = action.split(':', 1)
+            handler = (lambda message, target=target, command=command,
+                       **kwargs: execute(message, target, command, **kwargs))
+        else:
+            raise ValueError('Unknown binding action: `%s`' % action)
+        compiled.append(Binding(buttons, on, modifiers, action, handler, args,
+                                direction))
+    return BindingTable(compiled)
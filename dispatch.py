@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+import collections
+import threading
+
+from logging_helpers import _L
+
+from .joypad_state import StateChange, monotonic
+
+#: Available queue overflow policies (see :class:`SignalDispatcher`).
+OVERFLOW_POLICIES = ('drop-oldest', 'coalesce', 'block')
+
+
+class SignalDispatcher(object):
+    '''
+    Send signals from a worker thread through a bounded queue.
+
+    Decouples the joypad poller from signal receivers: :meth:`send` only
+    queues the signal, so a slow receiver (e.g., one that issues several hub
+    commands) cannot stall sampling.
+
+    ``state-changed`` messages are followed by a ``buttons-changed`` signal
+    with the same message if any buttons changed state (see
+    :func:`poller.check_joypads`).
+
+    Parameters
+    ----------
+    signals : blinker.Namespace
+        Namespace to send signals through.
+    maxsize : int, optional
+        Maximum number of queued signals.
+    overflow : str, optional
+        Policy when the queue is full:
+
+         - ``'drop-oldest'``: discard the oldest queued signal.
+         - ``'coalesce'``: merge the state change into the most recent
+           queued change of the same device, as long as no button changed
+           state in both (otherwise, discard the oldest queued signal).
+         - ``'block'``: wait until the worker makes room.
+
+    Attributes
+    ----------
+    dropped : int
+        Number of signals discarded because the queue was full.
+    coalesced : int
+        Number of state changes merged into a queued change.
+    max_depth : int
+        Largest number of queued signals seen.
+    '''
+    def __init__(self, signals, maxsize=64, overflow='drop-oldest'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('Unknown overflow policy `%s`.  Available '
+                             'policies: %s' % (overflow,
+                                               ', '.join(OVERFLOW_POLICIES)))
+        self.signals = signals
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self.enqueued = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        '''
+        Number of queued signals.
+        '''
+        return len(self._queue)
+
+    def start(self):
+        '''
+        Start worker thread.
+        '''
+        if self.is_alive():
+            raise RuntimeError('Worker thread is already running.')
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run,
+                                        name='joypad-dispatch')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def is_alive(self):
+        '''
+        Returns
+        -------
+        bool
+            ``True`` if worker thread is running.
+        '''
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=None):
+        '''
+        Stop worker thread, discarding any queued signals.
+
+        Senders blocked on a full queue are released immediately, i.e., even
+        if the worker thread does not finish within :data:`timeout`.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum seconds to wait for worker thread to finish.
+
+        Returns
+        -------
+        bool
+            ``True`` if worker thread has finished.
+        '''
+        with self._condition:
+            self._stopped = True
+            self._queue.clear()
+            self._condition.notify_all()
+        if (self._thread is not None and
+                self._thread is not threading.current_thread()):
+            self._thread.join(timeout)
+        if self.is_alive():
+            return False
+        self._thread = None
+        return True
+
+    def send(self, name, message):
+        '''
+        Queue signal to be sent by worker thread.
+
+        Parameters
+        ----------
+        name : str
+            Signal name.
+        message
+            Signal message.
+
+        Returns
+        -------
+        bool
+            ``False`` if the signal was discarded (i.e., dispatcher is
+            stopped).
+        '''
+        with self._condition:
+            if self._stopped:
+                return False
+            if len(self._queue) >= self.maxsize:
+                if self.overflow == 'block':
+                    while len(self._queue) >= self.maxsize:
+                        self._condition.wait()
+                        if self._stopped:
+                            return False
+                elif (self.overflow == 'coalesce' and
+                      self._coalesce(name, message)):
+                    self.enqueued += 1
+                    return True
+                else:
+                    self._queue.popleft()
+                    self.dropped += 1
+            self._queue.append((name, message))
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._condition.notify_all()
+            return True
+
+    def _coalesce(self, name, message):
+        if name != 'state-changed':
+            return False
+        for i in range(len(self._queue) - 1, -1, -1):
+            queued_name, queued = self._queue[i]
+            if (queued_name != name or
+                    queued.device_id != message.device_id):
+                continue
+            if queued.changed & message.changed:
+                # Merging would lose a button press or release.
+                return False
+            merged = StateChange(queued.old, message.new, message.device_id)
+            merged.settled = message.settled
+            self._queue[i] = (name, merged)
+            self.coalesced += 1
+            return True
+        return False
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                name, message = self._queue.popleft()
+                # Wake up any blocked sender.
+                self._condition.notify_all()
+            try:
+                if name == 'state-changed':
+                    message.dispatched = monotonic()
+                    self.signals.signal(name).send(message)
+                    if message.changed:
+                        self.signals.signal('buttons-changed').send(message)
+                else:
+                    self.signals.signal(name).send(message)
+            except Exception:
+                _L().info('Error sending `%s` signal.', name, exc_info=True)
+            self.dispatched += 1
+
+    def metrics(self):
+        '''
+        Returns
+        -------
+        dict
+            Current queue ``depth``, ``max_depth``, ``maxsize``,
+            ``overflow`` policy, and ``enqueued``, ``dispatched``,
+            ``dropped`` and ``coalesced`` signal counts.
+        '''
+        return {'depth': self.depth, 'max_depth': self.max_depth,
+                'maxsize': self.maxsize, 'overflow': self.overflow,
+                'enqueued': self.enqueued, 'dispatched': self.dispatched,
+                'dropped': self.dropped, 'coalesced': self.coalesced}
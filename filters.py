@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+from .joypad_state import JoypadState
+
+
+class StateDebouncer(object):
+    '''
+    Debounce joypad state as a whole.
+
+    A new state is accepted once the raw state has differed from the
+    accepted state for :attr:`settle_duration` seconds.  Any input changing
+    (e.g., analog stick noise) restarts the settle window of the entire
+    state.
+
+    Parameters
+    ----------
+    settle_duration : float, optional
+        Seconds raw state must differ from accepted state before it is
+        accepted.
+
+    Attributes
+    ----------
+    state : joypad_state.JoypadState or None
+        Accepted state.
+    deadline : float or None
+        Time a pending state is due to be accepted, or ``None`` if raw state
+        equals accepted state.
+    '''
+    def __init__(self, settle_duration=.010):
+        self.settle_duration = settle_duration
+        self.state = None
+        self.deadline = None
+
+    def reset(self):
+        self.state = None
+        self.deadline = None
+
+    def update(self, raw, now):
+        '''
+        Parameters
+        ----------
+        raw : joypad_state.JoypadState or None
+            Most recent raw state.
+        now : float
+            Current :func:`joypad_state.monotonic` time.
+
+        Returns
+        -------
+        bool
+            ``True`` if :attr:`state` was updated.
+        '''
+        if raw is None or raw is self.state or raw == self.state:
+            self.deadline = None
+            return False
+        if self.deadline is None:
+            self.deadline = now + self.settle_duration
+        if now < self.deadline:
+            return False
+        self.state = raw
+        self.deadline = None
+        return True
+
+
+def _earliest(a, b):
+    '''
+    Returns
+    -------
+    float or None
+        Earliest of two (optional) timestamps.
+    '''
+    if a is None or (b is not None and b < a):
+        return b
+    return a
+
+
+class InputDebouncer(object):
+    '''
+    Debounce each button and axis independently.
+
+    Each input has its own settle window: a button or axis change is
+    accepted once that input has differed from its accepted value for its
+    settle duration, regardless of other inputs.  A noisy axis therefore
+    cannot delay (or drop) button presses.
+
+    Per-button state is sized from the number of buttons of the device (and
+    grown if a higher button number is reported), so any button number is
+    supported.
+
+    An accepted state is stamped with the sample time of the earliest raw
+    state in which one of the accepted inputs changed (rather than the most
+    recent raw state), so sample-to-settle latency is measured from the
+    input change.
+
+    Parameters
+    ----------
+    settle_duration : float, optional
+        Default settle duration (seconds) of every input.
+    button_settle : dict, optional
+        Settle duration keyed by button number, overriding the default.
+    axis_settle : dict, optional
+        Settle duration keyed by axis name, overriding the default.
+
+    Attributes
+    ----------
+    state : joypad_state.JoypadState or None
+        Accepted state.
+    deadline : float or None
+        Time the earliest pending input is due to be accepted, or ``None`` if
+        no inputs are pending.
+    '''
+    def __init__(self, settle_duration=.010, button_settle=None,
+                 axis_settle=None):
+        self.settle_duration = settle_duration
+        self.button_settle = dict(button_settle or {})
+        self.axis_settle = dict(axis_settle or {})
+        self._button_settle = []
+        self._axis_names = None
+        self._axis_durations = ()
+        # Time each button/axis started to differ from its accepted value,
+        # and sample time of the raw state it first differed in.
+        self._button_since = []
+        self._axis_since = []
+        self._button_sampled = []
+        self._axis_sampled = []
+        self.reset()
+
+    def reset(self):
+        self.state = None
+        self.deadline = None
+        self._raw = None
+        self._pending_buttons = 0
+        self._pending_axes = 0
+
+    def _set_num_buttons(self, num_buttons):
+        for b in range(len(self._button_since), num_buttons):
+            self._button_settle.append(self.button_settle
+                                       .get(b, self.settle_duration))
+            self._button_since.append(0.)
+            self._button_sampled.append(None)
+
+    def _set_axis_names(self, axis_names):
+        self._axis_names = axis_names
+        self._axis_durations = [self.axis_settle.get(name,
+                                                     self.settle_duration)
+                                for name in axis_names]
+        self._axis_since = [0.] * len(axis_names)
+        self._axis_sampled = [None] * len(axis_names)
+
+    def update(self, raw, now):
+        '''
+        Parameters
+        ----------
+        raw : joypad_state.JoypadState or None
+            Most recent raw state.
+        now : float
+            Current :func:`joypad_state.monotonic` time.
+
+        Returns
+        -------
+        bool
+            ``True`` if :attr:`state` was updated.
+        '''
+        if raw is None:
+            return False
+        elif raw is self._raw and (self.deadline is None or
+                                   now < self.deadline):
+            # Raw state has not changed and no pending input is due.
+            return False
+        self._raw = raw
+        state = self.state
+        if state is None or raw.axis_names != self._axis_names:
+            # First state (or device layout changed); accept as is.
+            self._set_num_buttons(max(raw.num_buttons,
+                                      raw.buttons.bit_length()))
+            self._set_axis_names(raw.axis_names)
+            self.state = raw
+            self._pending_buttons = self._pending_axes = 0
+            self.deadline = None
+            return True
+
+        # Buttons.
+        differ = raw.buttons ^ state.buttons
+        since = self._button_since
+        sampled = self._button_sampled
+        if differ >> len(since):
+            # Button beyond those reported by the device.
+            self._set_num_buttons(differ.bit_length())
+        new = differ & ~self._pending_buttons
+        b = 0
+        while new:
+            if new & 1:
+                since[b] = now
+                sampled[b] = raw.timestamp
+            new >>= 1
+            b += 1
+        self._pending_buttons = pending = differ
+        accept = 0
+        deadline = None
+        # Sample time of earliest accepted change.
+        timestamp = None
+        b = 0
+        while pending:
+            if pending & 1:
+                due = since[b] + self._button_settle[b]
+                if now >= due:
+                    accept |= 1 << b
+                    timestamp = _earliest(timestamp, sampled[b])
+                elif deadline is None or due < deadline:
+                    deadline = due
+            pending >>= 1
+            b += 1
+        self._pending_buttons &= ~accept
+        buttons = state.buttons ^ accept
+
+        # Axes.
+        axes = state.axes
+        accepted_axes = None
+        pending_axes = 0
+        for i in range(len(axes)):
+            if raw.axes[i] == axes[i]:
+                continue
+            if not self._pending_axes & (1 << i):
+                self._axis_since[i] = now
+                self._axis_sampled[i] = raw.timestamp
+            due = self._axis_since[i] + self._axis_durations[i]
+            if now >= due:
+                if accepted_axes is None:
+                    accepted_axes = list(axes)
+                accepted_axes[i] = raw.axes[i]
+                timestamp = _earliest(timestamp, self._axis_sampled[i])
+            else:
+                pending_axes |= 1 << i
+                if deadline is None or due < deadline:
+                    deadline = due
+        self._pending_axes = pending_axes
+        self.deadline = deadline
+
+        if not accept and accepted_axes is None:
+            return False
+        self.state = JoypadState(buttons, axes if accepted_axes is None
+                                 else tuple(accepted_axes), raw.num_buttons,
+                                 raw.timestamp if timestamp is None
+                                 else timestamp, raw.axis_names)
+        return True
+
+
+class AxisZoneFilter(object):
+    '''
+    Quantize axes to discrete zones with a deadzone and hysteresis.
+
+    Each axis is mapped to one of three zones: negative (``-0.5``), neutral
+    (``0``) or positive (``0.5``).  An axis enters the positive/negative zone
+    once its magnitude exceeds the deadzone, and only returns to neutral once
+    its magnitude drops below ``deadzone - hysteresis``, so values jittering
+    around the deadzone edge do not toggle the zone.
+
+    Since stick noise within a zone no longer changes the state, only zone
+    transitions (and button changes) reach the debounce stage and state
+    change subscribers.
+
+    With :data:`levels` greater than one, the range beyond the deadzone is
+    further split into equal magnitude levels (e.g., to scale an auto-repeat
+    rate with stick deflection).  Level ``k`` of ``n`` is reported as
+    ``±(deadzone + (0.5 - deadzone) * k / n)``, so the outermost level is
+    ``±0.5``, and the hysteresis margin also applies to each level edge
+    (capped at half the level width).
+
+    Parameters
+    ----------
+    deadzone : float or dict, optional
+        Half-width of neutral zone (axis values are in range
+        ``[-0.5, 0.5]``), either for all axes or keyed by axis name.
+    hysteresis : float, optional
+        Margin below the deadzone edge an axis must drop to before returning
+        to the neutral zone.
+    levels : int, optional
+        Number of magnitude levels on each side of the neutral zone.
+    '''
+    def __init__(self, deadzone=.4, hysteresis=.05, levels=1):
+        self.deadzone = deadzone
+        self.hysteresis = hysteresis
+        self.levels = levels
+        self._axis_names = None
+        self._enter = ()
+        self._exit = ()
+        self._last = None
+
+    def _set_axis_names(self, axis_names):
+        self._axis_names = axis_names
+        if isinstance(self.deadzone, dict):
+            deadzones = [self.deadzone.get(name, .4) for name in axis_names]
+        else:
+            deadzones = [self.deadzone] * len(axis_names)
+        self._enter = deadzones
+        self._exit = [max(0, deadzone - self.hysteresis)
+                      for deadzone in deadzones]
+        # Lower edge, value, and exit threshold of each level above the
+        # first, i.e., `(edge, value, exit)`, innermost first.
+        self._levels = []
+        for deadzone in deadzones:
+            width = (.5 - deadzone) / self.levels
+            margin = min(self.hysteresis, .5 * width)
+            self._levels.append([(deadzone + width * k,
+                                  deadzone + width * (k + 1),
+                                  deadzone + width * k - margin)
+                                 for k in range(1, self.levels)])
+        self._values = [deadzone + (.5 - deadzone) / self.levels
+                        for deadzone in deadzones]
+        self._last = None
+
+    def reset(self):
+        self._last = None
+
+    def apply(self, state):
+        '''
+        Parameters
+        ----------
+        state : joypad_state.JoypadState
+            Raw state.
+
+        Returns
+        -------
+        joypad_state.JoypadState
+            State with each axis value replaced by its zone (``-0.5``, ``0``,
+            or ``0.5``).  If neither buttons nor zones changed, the previous
+            returned state object is returned again.
+        '''
+        if state.axis_names != self._axis_names:
+            self._set_axis_names(state.axis_names)
+        last = self._last
+        zones = []
+        for i, value in enumerate(state.axes):
+            zone = last.axes[i] if last is not None else 0.
+            if value > self._enter[i]:
+                zone = self._level(i, abs(value), zone if zone > 0 else 0.)
+            elif value < -self._enter[i]:
+                zone = -self._level(i, abs(value), -zone if zone < 0 else 0.)
+            elif (-self._exit[i] < value < self._exit[i] or
+                  zone * value < 0):
+                # Within neutral zone (or crossed over to the other side of
+                # it).
+                zone = 0.
+            elif zone:
+                # Within hysteresis margin of neutral zone; drop to innermost
+                # level.
+                zone = self._values[i] if zone > 0 else -self._values[i]
+            zones.append(zone)
+        zones = tuple(zones)
+        if (last is not None and zones == last.axes and
+                state.buttons == last.buttons):
+            return last
+        self._last = JoypadState(state.buttons, zones, state.num_buttons,
+                                 state.timestamp, state.axis_names)
+        return self._last
+
+    def _level(self, i, magnitude, current):
+        '''
+        Returns
+        -------
+        float
+            Zone magnitude of axis :data:`i` beyond the deadzone, given the
+            current zone magnitude.
+        '''
+        zone = self._values[i]
+        for edge, value, exit_ in self._levels[i]:
+            if magnitude > edge or (current >= value and magnitude > exit_):
+                zone = value
+            else:
+                break
+        return zone
+
+
+#: Debounce strategies, keyed by name.
+DEBOUNCERS = {'state': StateDebouncer, 'input': InputDebouncer}
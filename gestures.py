@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+import array
+
+from .bindings import gesture_key
+from .joypad_state import iter_bits, monotonic
+
+
+class GestureEvent(object):
+    '''
+    Recognized button gesture.
+
+    Attributes
+    ----------
+    gesture : str
+        Gesture name (see :data:`bindings.GESTURES`).
+    device_id : int
+        Identifier of joypad.
+    button : int
+        Button number.
+    direction : str or None
+        Direction of ``hold-direction`` gesture.
+    duration : float or None
+        Seconds button was held (``hold`` and ``long-press``) or between
+        taps (``double-tap``).
+    message : joypad_state.StateChange
+        State change that completed the gesture (or, for ``hold``, the
+        press that started it).
+    '''
+    __slots__ = ('gesture', 'device_id', 'button', 'direction', 'duration',
+                 'message')
+
+    def __init__(self, gesture, device_id, button, direction, duration,
+                 message):
+        self.gesture = gesture
+        self.device_id = device_id
+        self.button = button
+        self.direction = direction
+        self.duration = duration
+        self.message = message
+
+    def __repr__(self):
+        return ('<GestureEvent %s device_id=%r button=%d direction=%r '
+                'duration=%r>' % (self.gesture, self.device_id, self.button,
+                                  self.direction, self.duration))
+
+
+class _DeviceGestures(object):
+    '''
+    Preallocated per-button gesture state of a single joypad.
+
+    Parameters
+    ----------
+    num_buttons : int
+        Number of buttons to track, i.e., highest tracked button number
+        plus one.
+    '''
+    def __init__(self, num_buttons):
+        self.pressed_at = array.array('d', [0.]) * num_buttons
+        self.tapped_at = array.array('d', [float('-inf')]) * num_buttons
+        # Incremented on each press and release, so a pending `hold` timer
+        # can tell whether its press is still current.
+        self.generation = array.array('L', [0]) * num_buttons
+
+
+class GestureRecognizer(object):
+    '''
+    Recognize button gestures and trigger their bindings.
+
+    Gestures are:
+
+     - ``hold``: button held for :attr:`hold_duration` (triggered while
+       still held).
+     - ``long-press``: button released after being held for at least
+       :attr:`hold_duration`.
+     - ``double-tap``: button pressed twice within
+       :attr:`double_tap_interval`.
+     - ``hold-direction``: direction entered while button is held (see
+       :meth:`direction`).
+
+    Press and release bindings of the same button are not delayed, i.e.,
+    they are triggered along with any gesture.
+
+    Only buttons with gesture bindings are tracked.  Per-button state is
+    kept in arrays preallocated for each joypad, so the hot path (a state
+    change) only updates array entries; a timer is only scheduled when a
+    button with a ``hold`` binding is pressed, and all pending timeouts
+    share a single :class:`timers.TimerWheel`.
+
+    Parameters
+    ----------
+    table : bindings.BindingTable
+        Bindings (see :attr:`bindings.BindingTable.gestures`).
+    wheel : timers.TimerWheel
+        Timer wheel used for ``hold`` timeouts.
+    hold_duration : float, optional
+        Seconds a button must be held for ``hold`` and ``long-press``.
+    double_tap_interval : float, optional
+        Maximum seconds between presses of a ``double-tap``.
+    signal : blinker.Signal, optional
+        If specified, sent with each :class:`GestureEvent`.
+    '''
+    def __init__(self, table, wheel, hold_duration=.5,
+                 double_tap_interval=.3, signal=None):
+        self.table = table
+        self.wheel = wheel
+        self.hold_duration = hold_duration
+        self.double_tap_interval = double_tap_interval
+        self.signal = signal
+        masks = table.gesture_masks
+        self._hold_mask = masks['hold']
+        self._long_press_mask = masks['long-press']
+        self._double_tap_mask = masks['double-tap']
+        self._direction_mask = masks['hold-direction']
+        self._mask = (self._hold_mask | self._long_press_mask |
+                      self._double_tap_mask)
+        self._devices = {}
+
+    def _trigger(self, gesture, device_id, button, message, direction=None,
+                 duration=None):
+        binding = self.table.gestures.get(gesture_key(gesture, button,
+                                                      direction))
+        if binding is None:
+            return False
+        if self.signal is not None:
+            self.signal.send(GestureEvent(gesture, device_id, button,
+                                          direction, duration, message))
+        return binding(message) is not False
+
+    def update(self, message, now=None):
+        '''
+        Parameters
+        ----------
+        message : joypad_state.StateChange
+            Button state change.
+        now : float, optional
+            Time of change (default: sample time of new state).
+        '''
+        changed = message.changed & self._mask
+        if not changed:
+            return
+        if now is None:
+            now = message.timestamp
+            if now is None:
+                now = monotonic()
+        device_id = message.device_id
+        try:
+            device = self._devices[device_id]
+        except KeyError:
+            device = self._devices[device_id] = \
+                _DeviceGestures(self._mask.bit_length())
+        buttons = message.new.buttons
+        for b in iter_bits(changed):
+            bit = 1 << b
+            device.generation[b] = (device.generation[b] + 1) & 0xFFFFFFFF
+            if buttons & bit:
+                device.pressed_at[b] = now
+                if bit & self._double_tap_mask:
+                    interval = now - device.tapped_at[b]
+                    if interval <= self.double_tap_interval:
+                        # Do not count a third tap as another double tap.
+                        device.tapped_at[b] = float('-inf')
+                        self._trigger('double-tap', device_id, b, message,
+                                      duration=interval)
+                    else:
+                        device.tapped_at[b] = now
+                if bit & self._hold_mask:
+                    self.wheel.schedule(self.hold_duration,
+                                        self._hold_callback(
+                                            device, device_id, b,
+                                            device.generation[b], message))
+            elif bit & self._long_press_mask:
+                duration = now - device.pressed_at[b]
+                if duration >= self.hold_duration:
+                    self._trigger('long-press', device_id, b, message,
+                                  duration=duration)
+
+    def _hold_callback(self, device, device_id, button, generation, message):
+        def _on_hold():
+            if device.generation[button] == generation:
+                # Button is still held since the press.
+                self._trigger('hold', device_id, button, message,
+                              duration=self.hold_duration)
+        return _on_hold
+
+    def direction(self, message, direction):
+        '''
+        Trigger ``hold-direction`` binding of a held button, if any.
+
+        Parameters
+        ----------
+        message : joypad_state.StateChange
+            State change that entered direction.
+        direction : str
+            Direction entered.
+
+        Returns
+        -------
+        bool
+            ``True`` if a binding handled the direction, i.e., was
+            triggered and did not return ``False``.
+        '''
+        held = message.new.buttons & self._direction_mask
+        for b in iter_bits(held):
+            if self._trigger('hold-direction', message.device_id, b, message,
+                             direction=direction):
+                return True
+        return False
+
+    def reset(self, device_id=None):
+        '''
+        Forget gesture state (and cancel pending ``hold`` gestures) of a
+        joypad, or of all joypads.
+        '''
+        if device_id is None:
+            devices = list(self._devices.values())
+            self._devices.clear()
+        else:
+            devices = [self._devices.pop(device_id, None)]
+        for device in devices:
+            if device is not None:
+                for b in range(len(device.generation)):
+                    device.generation[b] = ((device.generation[b] + 1) &
+                                            0xFFFFFFFF)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+import array
+import collections
+import threading
+
+from .joypad_state import iter_bits, monotonic
+
+
+#: Number of buttons recorded by :class:`EventHistory` (button masks are
+#: stored as two 32-bit words).
+MAX_BUTTONS = 64
+
+#: Compact state change record returned by :meth:`EventHistory.query`.
+HistoryRecord = collections.namedtuple('HistoryRecord',
+                                       'timestamp device_id buttons pressed '
+                                       'released axes')
+
+
+class EventHistory(object):
+    '''
+    Fixed-capacity ring buffer of compact joypad state change records.
+
+    Each record stores the sample time, device identifier, button mask,
+    changed button mask and up to :attr:`max_axes` axis values in
+    preallocated arrays, i.e., about ``28 + 4 * max_axes`` bytes per record
+    (e.g., about 144 KiB for the default 4096 records with 2 axes).  Memory
+    use is fixed when the history is created and :meth:`append` does not
+    allocate; once full, the oldest record is overwritten.
+
+    Button masks are stored as two 32-bit words, so only buttons below
+    :data:`MAX_BUTTONS` are recorded (each additional 32 buttons would cost
+    another 8 bytes per record, i.e., 32 KiB for 4096 records).
+
+    Parameters
+    ----------
+    capacity : int, optional
+        Number of records to keep.
+    max_axes : int, optional
+        Number of axis values to keep per record; additional axes are
+        dropped.
+    '''
+    def __init__(self, capacity=4096, max_axes=2):
+        self.capacity = capacity
+        self.max_axes = max_axes
+        self._timestamps = array.array('d', [0.]) * capacity
+        self._device_ids = array.array('i', [0]) * capacity
+        # Low and high word of each mask.
+        self._buttons = array.array('I', [0]) * (2 * capacity)
+        self._changed = array.array('I', [0]) * (2 * capacity)
+        self._axes = array.array('f', [0.]) * (capacity * max_axes)
+        self._lock = threading.Lock()
+        #: Total number of records appended since last :meth:`clear`.
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self.total = 0
+
+    def append(self, message):
+        '''
+        Parameters
+        ----------
+        message : joypad_state.StateChange
+            State change to record.  Changes without a sample time are
+            recorded with the current :func:`joypad_state.monotonic` time.
+        '''
+        new = message.new
+        timestamp = new.timestamp
+        with self._lock:
+            i = self.total % self.capacity
+            self._timestamps[i] = (monotonic() if timestamp is None
+                                   else timestamp)
+            self._device_ids[i] = message.device_id or 0
+            buttons = new.buttons
+            changed = message.changed
+            j = 2 * i
+            self._buttons[j] = buttons & 0xFFFFFFFF
+            self._buttons[j + 1] = (buttons >> 32) & 0xFFFFFFFF
+            self._changed[j] = changed & 0xFFFFFFFF
+            self._changed[j + 1] = (changed >> 32) & 0xFFFFFFFF
+            offset = i * self.max_axes
+            axes = new.axes
+            for j in range(self.max_axes):
+                self._axes[offset + j] = axes[j] if j < len(axes) else 0.
+            self.total += 1
+
+    def _record(self, i):
+        j = 2 * i
+        buttons = self._buttons[j] | self._buttons[j + 1] << 32
+        changed = self._changed[j] | self._changed[j + 1] << 32
+        offset = i * self.max_axes
+        return HistoryRecord(self._timestamps[i], self._device_ids[i],
+                             buttons, changed & buttons, changed & ~buttons,
+                             tuple(self._axes[offset:offset + self.max_axes]))
+
+    def query(self, since=None, until=None, device_id=None, button=None):
+        '''
+        Parameters
+        ----------
+        since : float, optional
+            Only include records sampled at or after this
+            :func:`joypad_state.monotonic` time.
+        until : float, optional
+            Only include records sampled at or before this time.
+        device_id : int, optional
+            Only include records from this device.
+        button : int, optional
+            Only include records where this button was pressed or released.
+
+        Returns
+        -------
+        list
+            Matching :data:`HistoryRecord` entries, oldest first.
+
+        Raises
+        ------
+        ValueError
+            If :data:`button` is not recorded, i.e., not below
+            :data:`MAX_BUTTONS`.
+        '''
+        if button is None:
+            button_mask = None
+        elif 0 <= button < MAX_BUTTONS:
+            # Mask of button within its word of the changed mask.
+            word = button >> 5
+            button_mask = 1 << (button & 31)
+        else:
+            raise ValueError('Only buttons 0-%d are recorded.' %
+                             (MAX_BUTTONS - 1))
+        records = []
+        with self._lock:
+            count = min(self.total, self.capacity)
+            # Walk back from the newest record; samples are (approximately)
+            # in time order, so stop at the first record older than `since`.
+            for k in range(count):
+                i = (self.total - 1 - k) % self.capacity
+                timestamp = self._timestamps[i]
+                if since is not None and timestamp < since:
+                    break
+                if until is not None and timestamp > until:
+                    continue
+                if device_id is not None and self._device_ids[i] != device_id:
+                    continue
+                if (button_mask is not None and
+                        not self._changed[2 * i + word] & button_mask):
+                    continue
+                records.append(self._record(i))
+        records.reverse()
+        return records
+
+    def last(self, seconds, now=None, **kwargs):
+        '''
+        Parameters
+        ----------
+        seconds : float
+            Length of time window ending at :data:`now`.
+        now : float, optional
+            End of time window (default: current
+            :func:`joypad_state.monotonic` time).
+        **kwargs
+            Additional filters (see :meth:`query`).
+
+        Returns
+        -------
+        list
+            Matching :data:`HistoryRecord` entries, oldest first.
+        '''
+        if now is None:
+            now = monotonic()
+        return self.query(since=now - seconds, until=now, **kwargs)
+
+    def presses(self, seconds, now=None, **kwargs):
+        '''
+        Parameters
+        ----------
+        seconds : float
+            Length of time window ending at :data:`now`.
+        now : float, optional
+            End of time window (default: current
+            :func:`joypad_state.monotonic` time).
+        **kwargs
+            Additional filters (see :meth:`query`).
+
+        Returns
+        -------
+        list
+            ``(timestamp, device_id, button)`` of each button press in time
+            window, oldest first.
+        '''
+        return [(record.timestamp, record.device_id, b)
+                for record in self.last(seconds, now=now, **kwargs)
+                for b in iter_bits(record.pressed)]
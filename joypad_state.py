@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+try:
+    from time import monotonic
+except ImportError:
+    # Python 2.
+    try:
+        from monotonic import monotonic
+    except ImportError:
+        # On Windows, `time.clock()` is based on `QueryPerformanceCounter()`,
+        # which is monotonic and high resolution.  Elsewhere, `time.clock()`
+        # measures processor time, so fall back to wall-clock time.
+        monotonic = time.clock if sys.platform == 'win32' else time.time
+
+
+#: Default axis names, in the order they are stored in
+#: :attr:`JoypadState.axes`.
+AXIS_NAMES = ('x', 'y')
+
+
+def axis_factors(axis_min, axis_max):
+    '''
+    Return ``(scale, offset)`` such that ``position * scale + offset`` maps
+    the range ``[axis_min, axis_max]`` onto ``[-0.5, 0.5]``.
+    '''
+    span = float(axis_max - axis_min)
+    if span <= 0:
+        # Degenerate axis range; report axis as centered.
+        return 0., 0.
+    return 1. / span, -axis_min / span - .5
+
+
+def iter_bits(mask):
+    '''
+    Yield index of each set bit in integer mask, lowest first.
+
+    Parameters
+    ----------
+    mask : int
+        Bit mask.
+    '''
+    b = 0
+    while mask:
+        if mask & 1:
+            yield b
+        mask >>= 1
+        b += 1
+
+
+class JoypadState(object):
+    '''
+    Immutable joypad state.
+
+    Equality and hashing only consider :attr:`buttons` and :attr:`axes`
+    (i.e., not :attr:`timestamp`) and are O(1).
+
+    Parameters
+    ----------
+    buttons : int
+        Button mask (bit ``b`` is set if button ``b`` is pressed).
+    axes : tuple
+        Axis values (float in range ``[-0.5, 0.5]``), in order of
+        :attr:`axis_names`.
+    num_buttons : int
+        Number of buttons on device.
+    timestamp : float, optional
+        Monotonic time the state was sampled at (see :func:`monotonic`).
+    axis_names : tuple, optional
+        Name of each axis (default: :data:`AXIS_NAMES`).
+    '''
+    __slots__ = ('buttons', 'axes', 'num_buttons', 'timestamp', 'axis_names',
+                 '_hash', '_dict')
+
+    def __init__(self, buttons, axes, num_buttons, timestamp=None,
+                 axis_names=AXIS_NAMES):
+        set_ = object.__setattr__
+        set_(self, 'buttons', buttons)
+        set_(self, 'axes', axes)
+        set_(self, 'num_buttons', num_buttons)
+        set_(self, 'timestamp', timestamp)
+        set_(self, 'axis_names', axis_names)
+        set_(self, '_hash', hash((buttons, axes)))
+        set_(self, '_dict', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('`%s` is immutable.' % type(self).__name__)
+
+    def __eq__(self, other):
+        if not isinstance(other, JoypadState):
+            return NotImplemented
+        return self.buttons == other.buttons and self.axes == other.axes
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return ('<JoypadState buttons=%#x axes=%r>' %
+                (self.buttons, dict(zip(self.axis_names, self.axes))))
+
+    def axis(self, name):
+        '''
+        Parameters
+        ----------
+        name : str
+            Axis name, e.g., ``'x'``.
+
+        Returns
+        -------
+        float
+            Value of axis.
+        '''
+        return self.axes[self.axis_names.index(name)]
+
+    def is_pressed(self, button):
+        '''
+        Parameters
+        ----------
+        button : int
+            Button number.
+
+        Returns
+        -------
+        bool
+            ``True`` if button is pressed.
+        '''
+        return bool(self.buttons & (1 << button))
+
+    def as_dict(self):
+        '''
+        Returns
+        -------
+        dict
+            Legacy state dictionary, i.e., ``axes`` (keyed by axis name) and
+            ``button_states`` (list of ``bool``).  Built on first call and
+            cached; callers must not modify it.
+        '''
+        if self._dict is None:
+            buttons = self.buttons
+            state = {'axes': dict(zip(self.axis_names, self.axes)),
+                     'button_states': [bool(buttons & (1 << b))
+                                       for b in range(self.num_buttons)]}
+            object.__setattr__(self, '_dict', state)
+        return self._dict
+
+
+class ButtonMapping(object):
+    '''
+    Map physical button numbers of a device to logical button numbers.
+
+    Buttons not listed in the mapping keep their physical number.
+
+    Parameters
+    ----------
+    buttons : dict
+        Logical button number keyed by physical button number.
+    '''
+    def __init__(self, buttons):
+        self.buttons = dict(buttons)
+        self._mapped_mask = 0
+        for physical in self.buttons:
+            self._mapped_mask |= 1 << physical
+        self._num_buttons = max([b + 1 for b in self.buttons.values()] or [0])
+
+    def apply(self, state):
+        '''
+        Parameters
+        ----------
+        state : JoypadState
+            Device state.
+
+        Returns
+        -------
+        JoypadState
+            State with logical button numbers.
+        '''
+        mapped = state.buttons & self._mapped_mask
+        buttons = state.buttons & ~self._mapped_mask
+        for physical in iter_bits(mapped):
+            buttons |= 1 << self.buttons[physical]
+        return JoypadState(buttons, state.axes,
+                           max(state.num_buttons, self._num_buttons),
+                           state.timestamp, state.axis_names)
+
+
+class StateChange(object):
+    '''
+    Change between two joypad states.
+
+    Button changes are computed by XOR-ing the button masks, and axis deltas
+    directly from the axis tuples.
+
+    For compatibility with existing ``state-changed``/``buttons-changed``
+    subscribers, items may also be looked up by key, i.e., ``'old'`` and
+    ``'new'`` (legacy state dictionaries, see :meth:`JoypadState.as_dict`),
+    ``'diff'``, ``'buttons'``, ``'timestamp'``, and ``'device_id'``.  The
+    ``diff`` item is a :class:`deepdiff.DeepDiff` that is only computed on
+    first access.  Pipeline timestamps are also available as ``'sampled'``,
+    ``'settled'`` and ``'dispatched'`` items.
+
+    Parameters
+    ----------
+    old : JoypadState or None
+        Previous state.  ``None`` is treated as all buttons released and all
+        axes centered.
+    new : JoypadState
+        New state.
+    device_id : int, optional
+        Identifier of device the states were read from.
+
+    Attributes
+    ----------
+    changed : int
+        Mask of buttons that changed state.
+    pressed : int
+        Mask of buttons that were pressed.
+    released : int
+        Mask of buttons that were released.
+    axis_deltas : tuple
+        Change in value of each axis, in order of ``new.axis_names``.
+    settled : float or None
+        :func:`monotonic` time the change was accepted by the debounce stage.
+    dispatched : float or None
+        :func:`monotonic` time the change was sent to subscribers.
+    '''
+    __slots__ = ('old', 'new', 'device_id', 'changed', 'pressed', 'released',
+                 'axis_deltas', 'settled', 'dispatched', '_buttons', '_diff')
+    _ATTRIBUTE_KEYS = frozenset(['diff', 'buttons', 'timestamp', 'device_id',
+                                 'sampled', 'settled', 'dispatched'])
+
+    def __init__(self, old, new, device_id=None):
+        self.old = old
+        self.new = new
+        self.device_id = device_id
+        if old is None:
+            old_buttons = 0
+            self.axis_deltas = new.axes
+        else:
+            old_buttons = old.buttons
+            self.axis_deltas = tuple(n - o for n, o in zip(new.axes,
+                                                           old.axes))
+        self.changed = old_buttons ^ new.buttons
+        self.pressed = self.changed & new.buttons
+        self.released = self.changed & old_buttons
+        self.settled = None
+        self.dispatched = None
+        self._buttons = None
+        self._diff = None
+
+    @property
+    def buttons(self):
+        '''
+        New state of each changed button, keyed by button number.
+
+        Old value is not included because it is implied by the fact that a
+        state change occurred and the value is boolean.
+        '''
+        if self._buttons is None:
+            pressed = self.pressed
+            self._buttons = {b: bool(pressed & (1 << b))
+                             for b in iter_bits(self.changed)}
+        return self._buttons
+
+    @property
+    def timestamp(self):
+        '''
+        Time the new state was sampled (see :attr:`JoypadState.timestamp`).
+
+        For event-driven backends that provide them (e.g., evdev), this is
+        the kernel event time, so the delay between the device reporting the
+        input and the plugin handling it can be measured.
+        '''
+        return self.new.timestamp
+
+    sampled = timestamp
+
+    @property
+    def diff(self):
+        '''
+        :class:`deepdiff.DeepDiff` between legacy old and new state
+        dictionaries (computed on first access).
+        '''
+        if self._diff is None:
+            # Imported on first use to keep plugin load time down.
+            import deepdiff
+
+            self._diff = deepdiff.DeepDiff(self['old'], self['new'])
+        return self._diff
+
+    def __getitem__(self, key):
+        if key in ('old', 'new'):
+            state = getattr(self, key)
+            return {} if state is None else state.as_dict()
+        elif key in self._ATTRIBUTE_KEYS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in ('old', 'new') or key in self._ATTRIBUTE_KEYS
+
+    def __repr__(self):
+        return ('<StateChange device_id=%r changed=%#x pressed=%#x '
+                'released=%#x axis_deltas=%r>' %
+                (self.device_id, self.changed, self.pressed, self.released,
+                 self.axis_deltas))
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+import io
+import struct
+
+from .backends import JoypadBackend, JoypadDevice
+from .joypad_state import JoypadState, monotonic
+
+#: Magic bytes at start of trace file.
+TRACE_MAGIC = b'JPTR'
+TRACE_VERSION = 1
+
+# Header: magic, version, number of buttons, number of axes, length of
+# comma-separated axis names (followed by the names themselves).
+TRACE_HEADER = struct.Struct('<4sHHHH')
+
+
+def _record_struct(num_axes):
+    '''
+    Returns
+    -------
+    struct.Struct
+        Fixed-width trace record: timestamp (``double``), button mask
+        (``uint32``), and one ``float`` per axis.
+    '''
+    return struct.Struct('<dI%df' % num_axes)
+
+
+class TraceRecorder(object):
+    '''
+    Write joypad states to a compact binary trace file.
+
+    Each state is written as a fixed-width record (see
+    :func:`_record_struct`), i.e., 20 bytes for a two-axis joypad.
+
+    Parameters
+    ----------
+    path_or_file : str or file-like
+        Path or binary file to write trace to.  Files passed in are not
+        closed by :meth:`close`.
+
+    Attributes
+    ----------
+    count : int
+        Number of records written.
+    '''
+    def __init__(self, path_or_file):
+        if hasattr(path_or_file, 'write'):
+            self._file = path_or_file
+            self._owns_file = False
+        else:
+            self._file = io.open(path_or_file, 'wb')
+            self._owns_file = True
+        self._record = None
+        self._axis_names = None
+        self.count = 0
+
+    def record(self, state):
+        '''
+        Append state to trace.
+
+        The header is written with the first record, so all states in a
+        trace must have the same axes.
+
+        Parameters
+        ----------
+        state : joypad_state.JoypadState
+        '''
+        if self._record is None:
+            names = ','.join(state.axis_names).encode('ascii')
+            self._file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION,
+                                               state.num_buttons,
+                                               len(state.axis_names),
+                                               len(names)) + names)
+            self._record = _record_struct(len(state.axis_names))
+            self._axis_names = state.axis_names
+        elif state.axis_names != self._axis_names:
+            raise ValueError('Axes must not change within a trace.')
+        # Record format only has room for buttons 0-31.
+        self._file.write(self._record.pack(state.timestamp or 0.,
+                                           state.buttons & 0xFFFFFFFF,
+                                           *state.axes))
+        self.count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_trace(path_or_file):
+    '''
+    Read all states from a trace file.
+
+    Parameters
+    ----------
+    path_or_file : str or file-like
+        Path or binary file written by :class:`TraceRecorder`.
+
+    Returns
+    -------
+    list
+        Recorded :class:`joypad_state.JoypadState` objects, in order.
+    '''
+    if hasattr(path_or_file, 'read'):
+        data = path_or_file.read()
+    else:
+        with io.open(path_or_file, 'rb') as input_:
+            data = input_.read()
+    if len(data) < TRACE_HEADER.size:
+        raise ValueError('Truncated trace header.')
+    magic, version, num_buttons, num_axes, names_length = \
+        TRACE_HEADER.unpack_from(data)
+    if magic != TRACE_MAGIC:
+        raise ValueError('Not a joypad trace.')
+    elif version != TRACE_VERSION:
+        raise ValueError('Unsupported trace version: %d' % version)
+    offset = TRACE_HEADER.size
+    axis_names = tuple(data[offset:offset + names_length].decode('ascii')
+                       .split(',')) if names_length else ()
+    offset += names_length
+    record = _record_struct(num_axes)
+    states = []
+    for offset in range(offset, len(data) - record.size + 1, record.size):
+        values = record.unpack_from(data, offset)
+        states.append(JoypadState(values[1], values[2:], num_buttons,
+                                  values[0], axis_names))
+    return states
+
+
+class ReplayDevice(JoypadDevice):
+    '''
+    Polled device that replays recorded states.
+
+    Parameters
+    ----------
+    device_id : int
+        Device identifier.
+    states : list
+        Recorded states (see :func:`read_trace`).
+    speed : float, optional
+        Replay speed relative to the recording, e.g., ``1`` for real time or
+        ``10`` for ten times faster.  If ``None``, each :meth:`read` returns
+        the next recorded state, i.e., as fast as the device is polled.
+
+    Attributes
+    ----------
+    finished : bool
+        ``True`` once all recorded states have been replayed.
+
+    Notes
+    -----
+    Replayed states are re-stamped with the :func:`joypad_state.monotonic`
+    time they were scheduled for, so latency measurements on replayed
+    traces are comparable to live input.
+    '''
+    __slots__ = ('device_id', 'state', 'finished', '_states', '_speed',
+                 '_index', '_start')
+
+    def __init__(self, device_id, states, speed=1.):
+        self.device_id = device_id
+        self._states = states
+        self._speed = speed
+        self._index = 0
+        self._start = None
+        self.state = None
+        self.finished = not states
+
+    def read(self):
+        if self.finished:
+            return False
+        states = self._states
+        now = monotonic()
+        if self._start is None:
+            self._start = now
+        if self._speed is None:
+            i = self._index
+            timestamp = now
+        else:
+            # Advance to most recent state that is due.
+            t0 = states[0].timestamp
+            i = self._index
+            if (states[i].timestamp - t0) / self._speed > now - self._start:
+                return False
+            while (i + 1 < len(states) and
+                   (states[i + 1].timestamp - t0) / self._speed <=
+                   now - self._start):
+                i += 1
+            timestamp = self._start + (states[i].timestamp - t0) / self._speed
+        recorded = states[i]
+        self._index = i + 1
+        self.finished = self._index >= len(states)
+        self.state = JoypadState(recorded.buttons, recorded.axes,
+                                 recorded.num_buttons, timestamp,
+                                 recorded.axis_names)
+        return True
+
+
+class ReplayBackend(JoypadBackend):
+    '''
+    Polling backend that replays a recorded trace as device ``0``.
+
+    Parameters
+    ----------
+    path_or_file : str or file-like
+        Trace written by :class:`TraceRecorder`.
+    speed : float, optional
+        Replay speed (see :class:`ReplayDevice`).
+    '''
+    event_driven = False
+
+    def __init__(self, path_or_file, speed=1.):
+        self.states = read_trace(path_or_file)
+        self.speed = speed
+
+    def enumerate(self):
+        return [0]
+
+    def is_available(self, device_id):
+        return device_id == 0
+
+    def open(self, device_id):
+        if device_id != 0:
+            raise IOError('Replay device %d not available.' % device_id)
+        return ReplayDevice(device_id, self.states, self.speed)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+import array
+import threading
+
+
+class LatencyHistogram(object):
+    '''
+    Fixed-size latency histogram with log-linear buckets (HDR-style).
+
+    Latencies are recorded in whole microseconds.  Each power-of-two range is
+    split into ``2 ** significant_bits`` linear sub-buckets, so recorded
+    values are resolved to within ``2 ** -significant_bits`` (about 3% with
+    the default of 5 bits) over the whole range.  Counts are stored in a
+    preallocated array, so memory use is constant and recording does not
+    allocate.
+
+    Parameters
+    ----------
+    max_seconds : float, optional
+        Largest latency to track; larger values are clamped.
+    significant_bits : int, optional
+        Number of bits of precision per power-of-two range.
+    '''
+    def __init__(self, max_seconds=100., significant_bits=5):
+        self.significant_bits = significant_bits
+        self._sub_buckets = 1 << significant_bits
+        self._max_value = int(max_seconds * 1e6)
+        self._counts = array.array('L', [0] *
+                                   (self._index(self._max_value) + 1))
+        self.reset()
+
+    def reset(self):
+        for i in range(len(self._counts)):
+            self._counts[i] = 0
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        exponent = value.bit_length() - self.significant_bits
+        if exponent <= 0:
+            # Values below `2 ** significant_bits` are stored exactly.
+            return value
+        # `value >> exponent` is in `[sub_buckets / 2, sub_buckets)`.
+        half = self._sub_buckets // 2
+        return (self._sub_buckets + (exponent - 1) * half +
+                (value >> exponent) - half)
+
+    def _value(self, index):
+        '''
+        Returns
+        -------
+        int
+            Lowest value (microseconds) of bucket.
+        '''
+        if index < self._sub_buckets:
+            return index
+        half = self._sub_buckets // 2
+        exponent, mantissa = divmod(index - self._sub_buckets, half)
+        return (mantissa + half) << (exponent + 1)
+
+    def record(self, seconds):
+        '''
+        Parameters
+        ----------
+        seconds : float
+            Latency to record.  Negative values are recorded as zero.
+        '''
+        value = min(max(0, int(seconds * 1e6)), self._max_value)
+        self._counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        '''
+        Parameters
+        ----------
+        percent : float
+            Percentile in range ``[0, 100]``.
+
+        Returns
+        -------
+        float or None
+            Latency (seconds) at or below which :data:`percent` of recorded
+            latencies fall, or ``None`` if no latencies were recorded.
+        '''
+        if not self.count:
+            return None
+        target = max(1, int(round(percent / 100. * self.count)))
+        cumulative = 0
+        for i, count in enumerate(self._counts):
+            cumulative += count
+            if cumulative >= target:
+                return min(self._value(i), self.max) * 1e-6
+        return self.max * 1e-6
+
+    def summary(self):
+        '''
+        Returns
+        -------
+        dict
+            ``count``, ``min``, ``mean``, ``p50``, ``p90``, ``p99`` and
+            ``max`` latency (seconds).
+        '''
+        if not self.count:
+            return {'count': 0}
+        return {'count': self.count, 'min': self.min * 1e-6,
+                'mean': self.total * 1e-6 / self.count,
+                'p50': self.percentile(50), 'p90': self.percentile(90),
+                'p99': self.percentile(99), 'max': self.max * 1e-6}
+
+
+class LatencyTracker(object):
+    '''
+    Thread-safe collection of :class:`LatencyHistogram` objects, keyed by
+    ``(name, stage)``, e.g., ``('next_step', 'round_trip')``.
+
+    Parameters
+    ----------
+    **kwargs
+        Keyword arguments passed to each :class:`LatencyHistogram`.
+    '''
+    def __init__(self, **kwargs):
+        self._kwargs = kwargs
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, stage, seconds):
+        with self._lock:
+            try:
+                histogram = self._histograms[(name, stage)]
+            except KeyError:
+                histogram = LatencyHistogram(**self._kwargs)
+                self._histograms[(name, stage)] = histogram
+            histogram.record(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def summary(self):
+        '''
+        Returns
+        -------
+        dict
+            Latency summary (see :meth:`LatencyHistogram.summary`) of each
+            stage, keyed by name and then stage.
+        '''
+        with self._lock:
+            result = {}
+            for (name, stage), histogram in self._histograms.items():
+                result.setdefault(name, {})[stage] = histogram.summary()
+            return result
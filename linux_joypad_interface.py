@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+# Further reading about the Linux joystick and input event APIs:
+# https://www.kernel.org/doc/Documentation/input/joystick-api.txt
+# https://www.kernel.org/doc/Documentation/input/input.txt
+from __future__ import division
+import array
+import errno
+import fcntl
+import glob
+import os
+import re
+import struct
+import time
+
+from .backends import JoypadBackend, JoypadDevice
+from .joypad_state import AXIS_NAMES, JoypadState, axis_factors, monotonic
+
+# struct js_event {
+#     __u32 time;     /* event timestamp in milliseconds */
+#     __s16 value;    /* value */
+#     __u8 type;      /* event type */
+#     __u8 number;    /* axis/button number */
+# };
+JS_EVENT = struct.Struct('IhBB')
+
+JS_EVENT_BUTTON = 0x01
+JS_EVENT_AXIS = 0x02
+JS_EVENT_INIT = 0x80
+
+JSIOCGAXES = 0x80016a11
+JSIOCGBUTTONS = 0x80016a12
+
+#: Maximum absolute raw axis value reported by joydev.
+JS_AXIS_MAX = 32767
+
+#: Number of events to read per ``os.read`` call.
+READ_EVENTS = 64
+
+# struct input_event {
+#     struct timeval time;
+#     __u16 type;
+#     __u16 code;
+#     __s32 value;
+# };
+INPUT_EVENT = struct.Struct('llHHi')
+
+# struct input_absinfo {
+#     __s32 value, minimum, maximum, fuzz, flat, resolution;
+# };
+INPUT_ABSINFO = struct.Struct('6i')
+
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_ABS = 0x03
+SYN_REPORT = 0
+SYN_DROPPED = 3
+ABS_X = 0x00
+ABS_Y = 0x01
+ABS_CNT = 0x40
+BTN_MISC = 0x100
+BTN_JOYSTICK = 0x120
+KEY_CNT = 0x300
+
+CLOCK_MONOTONIC = 1
+
+_IOC_WRITE = 1
+_IOC_READ = 2
+
+
+def _IOC(direction, type_, nr, size):
+    return (direction << 30) | (size << 16) | (ord(type_) << 8) | nr
+
+
+def EVIOCGBIT(ev, length):
+    return _IOC(_IOC_READ, 'E', 0x20 + ev, length)
+
+
+def EVIOCGKEY(length):
+    return _IOC(_IOC_READ, 'E', 0x18, length)
+
+
+def EVIOCGABS(abs_):
+    return _IOC(_IOC_READ, 'E', 0x40 + abs_, INPUT_ABSINFO.size)
+
+
+EVIOCSCLOCKID = _IOC(_IOC_WRITE, 'E', 0xa0, struct.calcsize('i'))
+
+#: Absolute axes reported, in order of :data:`joypad_state.AXIS_NAMES`.
+EVDEV_AXES = (ABS_X, ABS_Y)
+
+cre_js_device = re.compile(r'js(?P<device_id>\d+)$')
+cre_event_device = re.compile(r'event(?P<device_id>\d+)$')
+
+
+def _ioctl_u8(fd, request):
+    buf = array.array('B', [0])
+    fcntl.ioctl(fd, request, buf)
+    return buf[0]
+
+
+def _ioctl_bits(fd, request, length):
+    '''
+    Returns
+    -------
+    int
+        Bit mask filled by ``ioctl`` request (e.g., :func:`EVIOCGBIT`).
+    '''
+    buf = array.array('B', [0] * length)
+    fcntl.ioctl(fd, request, buf)
+    mask = 0
+    for i, byte in enumerate(buf):
+        mask |= byte << (8 * i)
+    return mask
+
+
+def _list_devices(pattern, cre_device):
+    device_ids = []
+    for path in glob.glob(pattern):
+        match = cre_device.search(path)
+        if match:
+            device_ids.append(int(match.group('device_id')))
+    return sorted(device_ids)
+
+
+class JoydevDevice(JoypadDevice):
+    '''
+    Joystick read through the Linux joydev interface (``/dev/input/js*``).
+
+    The device file is opened in non-blocking mode; wait for
+    :meth:`fileno` to become readable before calling :meth:`read`.
+
+    Parameters
+    ----------
+    device_id : int
+        Joystick number, i.e., ``N`` in ``/dev/input/jsN``.
+    '''
+    __slots__ = ('device_id', 'state', '_fd', '_num_buttons', '_buttons',
+                 '_axes')
+
+    def __init__(self, device_id):
+        self.device_id = device_id
+        path = '/dev/input/js%d' % device_id
+        try:
+            self._fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        except OSError as exception:
+            raise IOError(exception.errno, 'Joystick %d not available: %s' %
+                          (device_id, exception.strerror), path)
+        try:
+            self._num_buttons = _ioctl_u8(self._fd, JSIOCGBUTTONS)
+        except IOError:
+            self._num_buttons = 0
+        self.state = None
+        self._buttons = 0
+        self._axes = [0.] * len(AXIS_NAMES)
+
+    def fileno(self):
+        return self._fd
+
+    def read(self):
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, READ_EVENTS * JS_EVENT.size)
+            except OSError as exception:
+                if exception.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise IOError(exception.errno, 'Joystick %d read failed: %s'
+                              % (self.device_id, exception.strerror))
+            if not data:
+                raise IOError(errno.ENODEV, 'Joystick %d was removed.' %
+                              self.device_id)
+            for offset in range(0, len(data), JS_EVENT.size):
+                time_ms, value, type_, number = \
+                    JS_EVENT.unpack_from(data, offset)
+                type_ &= ~JS_EVENT_INIT
+                if type_ == JS_EVENT_BUTTON:
+                    if number >= self._num_buttons:
+                        self._num_buttons = number + 1
+                    if value:
+                        self._buttons |= 1 << number
+                    else:
+                        self._buttons &= ~(1 << number)
+                    changed = True
+                elif type_ == JS_EVENT_AXIS and number < len(self._axes):
+                    # Remap axes to float in range [-0.5, 0.5]
+                    self._axes[number] = value / (2 * JS_AXIS_MAX)
+                    changed = True
+            if len(data) < READ_EVENTS * JS_EVENT.size:
+                break
+        if changed:
+            state = JoypadState(self._buttons, tuple(self._axes),
+                                self._num_buttons, monotonic())
+            if state != self.state:
+                self.state = state
+                return True
+        return False
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class JoydevBackend(JoypadBackend):
+    '''
+    Event-driven backend using the Linux joydev interface.
+    '''
+    event_driven = True
+
+    def enumerate(self):
+        return _list_devices('/dev/input/js*', cre_js_device)
+
+    def is_available(self, device_id):
+        return os.path.exists('/dev/input/js%d' % device_id)
+
+    def open(self, device_id):
+        device = JoydevDevice(device_id)
+        try:
+            device.read()
+        except IOError:
+            device.close()
+            raise
+        return device
+
+
+def _clock_offset(monotonic_timestamps):
+    '''
+    Parameters
+    ----------
+    monotonic_timestamps : bool
+        ``True`` if kernel timestamps are on ``CLOCK_MONOTONIC`` (otherwise,
+        they are wall-clock time).
+
+    Returns
+    -------
+    float
+        Seconds to add to kernel event timestamps to convert them to
+        :func:`joypad_state.monotonic` time.
+    '''
+    if not monotonic_timestamps:
+        return monotonic() - time.time()
+    try:
+        return monotonic() - time.clock_gettime(time.CLOCK_MONOTONIC)
+    except AttributeError:
+        # Python < 3.3; `monotonic()` is only used for kernel timestamps if
+        # it is a monotonic clock, i.e., `CLOCK_MONOTONIC` on Linux.
+        return 0.
+
+
+class EvdevDevice(JoypadDevice):
+    '''
+    Joystick read through the Linux input event interface
+    (``/dev/input/event*``).
+
+    Pending events are read in bulk and decoded with a precompiled
+    :data:`INPUT_EVENT` structure.  A new state is built for each
+    ``SYN_REPORT`` and stamped with the kernel event time, which is
+    requested on ``CLOCK_MONOTONIC`` where supported.  Kernel times are
+    converted to :func:`joypad_state.monotonic` time with an offset
+    measured when the device is opened, so they are comparable to the
+    plugin's other timestamps whichever clock either is on.
+
+    If the kernel drops events (``SYN_DROPPED``), the events up to the next
+    ``SYN_REPORT`` are discarded and the complete device state is read
+    again instead.
+
+    Buttons are numbered in the same order as the joydev interface, i.e.,
+    joystick/gamepad buttons first, followed by miscellaneous buttons.
+
+    Parameters
+    ----------
+    device_id : int
+        Event device number, i.e., ``N`` in ``/dev/input/eventN``.
+
+    Attributes
+    ----------
+    monotonic_timestamps : bool
+        ``True`` if kernel timestamps are on ``CLOCK_MONOTONIC`` (otherwise,
+        they are wall-clock time).
+    '''
+    __slots__ = ('device_id', 'state', 'monotonic_timestamps', '_fd',
+                 '_button_numbers', '_axis_indexes', '_axis_factors',
+                 '_buttons', '_axes', '_dirty', '_dropping',
+                 '_clock_offset')
+
+    def __init__(self, device_id):
+        self.device_id = device_id
+        path = '/dev/input/event%d' % device_id
+        try:
+            self._fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        except OSError as exception:
+            raise IOError(exception.errno, 'Joystick %d not available: %s' %
+                          (device_id, exception.strerror), path)
+        try:
+            self._init_device(path)
+        except IOError:
+            os.close(self._fd)
+            raise
+
+    def _init_device(self, path):
+        self.monotonic_timestamps = False
+        if monotonic is not time.time:
+            # Request kernel timestamps on `CLOCK_MONOTONIC` (unless
+            # `monotonic()` falls back to wall-clock time).
+            try:
+                fcntl.ioctl(self._fd, EVIOCSCLOCKID,
+                            struct.pack('i', CLOCK_MONOTONIC))
+                self.monotonic_timestamps = True
+            except IOError:
+                pass
+        self._clock_offset = _clock_offset(self.monotonic_timestamps)
+        keys = _ioctl_bits(self._fd, EVIOCGBIT(EV_KEY, KEY_CNT // 8),
+                           KEY_CNT // 8)
+        abs_bits = _ioctl_bits(self._fd, EVIOCGBIT(EV_ABS, ABS_CNT // 8),
+                               ABS_CNT // 8)
+        if not abs_bits & (1 << ABS_X) or not keys >> BTN_MISC:
+            raise IOError(errno.ENODEV, 'Input device %d is not a joystick.' %
+                          self.device_id, path)
+        codes = [code for code in (list(range(BTN_JOYSTICK, KEY_CNT)) +
+                                   list(range(BTN_MISC, BTN_JOYSTICK)))
+                 if keys & (1 << code)]
+        self._button_numbers = {code: i for i, code in enumerate(codes)}
+        self._axis_indexes = {code: i for i, code in enumerate(EVDEV_AXES)
+                              if abs_bits & (1 << code)}
+        self._axis_factors = {}
+        self._buttons = 0
+        self._axes = [0.] * len(AXIS_NAMES)
+        self._sync()
+        self._dirty = False
+        # `True` while discarding events after the kernel dropped events.
+        self._dropping = False
+        self.state = self._build_state(monotonic())
+
+    def _sync(self):
+        '''
+        Read complete device state, e.g., after events were dropped.
+        '''
+        keys = _ioctl_bits(self._fd, EVIOCGKEY(KEY_CNT // 8), KEY_CNT // 8)
+        self._buttons = 0
+        for code, number in self._button_numbers.items():
+            if keys & (1 << code):
+                self._buttons |= 1 << number
+        for code, i in self._axis_indexes.items():
+            absinfo = fcntl.ioctl(self._fd, EVIOCGABS(code),
+                                  b'\0' * INPUT_ABSINFO.size)
+            value, minimum, maximum = INPUT_ABSINFO.unpack(absinfo)[:3]
+            self._axis_factors[code] = scale, offset = axis_factors(minimum,
+                                                                   maximum)
+            self._axes[i] = value * scale + offset
+        self._dirty = True
+
+    def _build_state(self, timestamp):
+        return JoypadState(self._buttons, tuple(self._axes),
+                           len(self._button_numbers), timestamp)
+
+    def fileno(self):
+        return self._fd
+
+    def read(self):
+        changed = False
+        event_size = INPUT_EVENT.size
+        while True:
+            try:
+                data = os.read(self._fd, READ_EVENTS * event_size)
+            except OSError as exception:
+                if exception.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise IOError(exception.errno, 'Joystick %d read failed: %s'
+                              % (self.device_id, exception.strerror))
+            if not data:
+                raise IOError(errno.ENODEV, 'Joystick %d was removed.' %
+                              self.device_id)
+            for offset in range(0, len(data), event_size):
+                seconds, microseconds, type_, code, value = \
+                    INPUT_EVENT.unpack_from(data, offset)
+                if type_ == EV_SYN:
+                    if code == SYN_DROPPED:
+                        # Kernel buffer overflowed; discard events up to and
+                        # including the next `SYN_REPORT`, since they are
+                        # incomplete (and may be older than the state read
+                        # by `_sync()`).
+                        self._dropping = True
+                    elif code == SYN_REPORT:
+                        if self._dropping:
+                            self._dropping = False
+                            self._sync()
+                        elif not self._dirty:
+                            continue
+                        self._dirty = False
+                        state = self._build_state(seconds +
+                                                  1e-6 * microseconds +
+                                                  self._clock_offset)
+                        if state != self.state:
+                            self.state = state
+                            changed = True
+                elif self._dropping:
+                    continue
+                elif type_ == EV_KEY:
+                    number = self._button_numbers.get(code)
+                    if number is not None:
+                        if value:
+                            self._buttons |= 1 << number
+                        else:
+                            self._buttons &= ~(1 << number)
+                        self._dirty = True
+                elif type_ == EV_ABS:
+                    i = self._axis_indexes.get(code)
+                    if i is not None:
+                        scale, offset_ = self._axis_factors[code]
+                        self._axes[i] = value * scale + offset_
+                        self._dirty = True
+            if len(data) < READ_EVENTS * event_size:
+                break
+        return changed
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class EvdevBackend(JoypadBackend):
+    '''
+    Event-driven backend using the Linux input event interface.
+
+    State timestamps are kernel event times (see :class:`EvdevDevice`).
+    '''
+    event_driven = True
+
+    def enumerate(self):
+        device_ids = []
+        for device_id in _list_devices('/dev/input/event*',
+                                       cre_event_device):
+            try:
+                EvdevDevice(device_id).close()
+            except IOError:
+                # Not a joystick, or not readable.
+                continue
+            device_ids.append(device_id)
+        return device_ids
+
+    def is_available(self, device_id):
+        return os.path.exists('/dev/input/event%d' % device_id)
+
+    def open(self, device_id):
+        return EvdevDevice(device_id)
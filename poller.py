@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+from logging_helpers import _L
+import trollius as asyncio
+
+from .backends import get_backend
+from .filters import (DEBOUNCERS, AxisZoneFilter, InputDebouncer,
+                      StateDebouncer)
+from .joypad_state import StateChange, monotonic
+from .latency import LatencyHistogram
+
+
+class PollRateGovernor(object):
+    '''
+    Adaptive poll interval for polling backends.
+
+    Polls at the fast rate while the joypad is in use, drops to the idle rate
+    once no change has been seen for :attr:`idle_timeout` seconds, and snaps
+    back to the fast rate on the first changed sample.
+
+    Parameters
+    ----------
+    fast_interval : float, optional
+        Seconds between polls while joypad is active.
+    idle_interval : float, optional
+        Seconds between polls while joypad is idle.
+    idle_timeout : float, optional
+        Seconds without changes before switching to idle rate.
+
+    Attributes
+    ----------
+    interval : float
+        Current poll interval.
+    wakeups_per_second : float
+        Number of wake ups per second, measured over the most recent window of
+        at least one second.
+    jitter : latency.LatencyHistogram
+        How late each poll woke up relative to its scheduled time (see
+        :meth:`record_jitter`).
+    '''
+    def __init__(self, fast_interval=.001, idle_interval=.02,
+                 idle_timeout=2.):
+        self.fast_interval = fast_interval
+        self.idle_interval = idle_interval
+        self.idle_timeout = idle_timeout
+        self.interval = fast_interval
+        self.wakeups_per_second = 0.
+        self.jitter = LatencyHistogram(max_seconds=1.)
+        now = monotonic()
+        self._last_active = now
+        self._window_start = now
+        self._wakeups = 0
+
+    @property
+    def rate(self):
+        '''
+        Current poll rate (Hz).
+        '''
+        return 1. / self.interval if self.interval > 0 else float('inf')
+
+    @property
+    def idle(self):
+        '''
+        ``True`` if polling at the idle rate.
+        '''
+        return self.interval != self.fast_interval
+
+    def update(self, active, now=None):
+        '''
+        Record a wake up.
+
+        Parameters
+        ----------
+        active : bool
+            ``True`` if joypad input changed (or a change is still settling).
+        now : float, optional
+            Current :func:`joypad_state.monotonic` time.
+
+        Returns
+        -------
+        float
+            Seconds to sleep until next poll.
+        '''
+        if now is None:
+            now = monotonic()
+        self._wakeups += 1
+        elapsed = now - self._window_start
+        if elapsed >= 1.:
+            self.wakeups_per_second = self._wakeups / elapsed
+            self._wakeups = 0
+            self._window_start = now
+        if active:
+            self._last_active = now
+            self.interval = self.fast_interval
+        elif now - self._last_active > self.idle_timeout:
+            self.interval = self.idle_interval
+        return self.interval
+
+    def record_jitter(self, lateness):
+        '''
+        Parameters
+        ----------
+        lateness : float
+            Seconds a poll woke up after its scheduled time.
+        '''
+        self.jitter.record(lateness)
+
+    def metrics(self):
+        '''
+        Returns
+        -------
+        dict
+            Current poll ``interval`` (seconds), poll ``rate`` (Hz),
+            ``wakeups_per_second``, whether the governor is ``idle``, and
+            wake up ``jitter`` summary (see
+            :meth:`latency.LatencyHistogram.summary`).
+        '''
+        return {'interval': self.interval, 'rate': self.rate,
+                'wakeups_per_second': self.wakeups_per_second,
+                'idle': self.idle, 'jitter': self.jitter.summary()}
+
+
+class ReconnectBackoff(object):
+    '''
+    Exponential backoff between probes for a disconnected device.
+
+    Parameters
+    ----------
+    initial : float, optional
+        Seconds to wait before first probe.
+    maximum : float, optional
+        Maximum seconds between probes.
+    factor : float, optional
+        Factor to increase wait by after each failed probe.
+    '''
+    def __init__(self, initial=.05, maximum=2., factor=2.):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.reset()
+
+    def reset(self):
+        self.delay = self.initial
+
+    def next(self):
+        '''
+        Returns
+        -------
+        float
+            Seconds to wait before next probe.
+        '''
+        delay = self.delay
+        self.delay = min(self.maximum, delay * self.factor)
+        return delay
+
+
+def _send_signal(signals, dispatcher, name, message):
+    if dispatcher is not None:
+        dispatcher.send(name, message)
+        return
+    try:
+        if name == 'state-changed':
+            message.dispatched = monotonic()
+            signals.signal(name).send(message)
+            # Send `buttons-changed` signal if buttons have changed state.
+            # `buttons` property is a dictionary of new button states (i.e.,
+            # `<new_value>`) keyed by button number (see
+            # `StateChange.buttons`).
+            if message.changed:
+                signals.signal('buttons-changed').send(message)
+        else:
+            signals.signal(name).send(message)
+    except Exception:
+        _L().info('Error sending `%s` signal.', name, exc_info=True)
+
+
+class _MonitoredDevice(object):
+    '''
+    Per-device state of :func:`check_joypads`.
+    '''
+    def __init__(self, joy_id, mapping, zone_filter, recorder, backoff,
+                 debouncer, readable):
+        self.joy_id = joy_id
+        self.mapping = mapping
+        self.zone_filter = zone_filter
+        self.recorder = recorder
+        self.backoff = backoff
+        #: Accepts raw states; its `state` is the most recent reported state.
+        self.debouncer = debouncer
+        self.device = None
+        #: Most recent (mapped and quantized) raw state read from device.
+        self.state = None
+        #: Time to next probe for disconnected device.
+        self.next_probe = 0.
+        #: `True` if device has input pending (event-driven backends only).
+        self.ready = False
+        #: Event set to wake up the poller when input is pending.
+        self.readable = readable
+
+    @property
+    def settling(self):
+        '''
+        ``True`` if a changed input is waiting to settle.
+        '''
+        return self.debouncer.deadline is not None
+
+    def set_ready(self):
+        self.ready = True
+        self.readable.set()
+
+
+@asyncio.coroutine
+def check_joypads(signals, joy_ids, poll_interval=.001, settle_duration=.010,
+                  backend=None, mappings=None, recorders=None, governor=None,
+                  backoff_factory=ReconnectBackoff, debounce='input',
+                  button_settle=None, axis_settle=None, deadzone=None,
+                  hysteresis=.05, axis_levels=1, dispatcher=None, **kwargs):
+    '''
+    Monitor one or more joypads and send signals when their state changes.
+
+    All joypads are serviced by a single loop: polling backends read every
+    device round-robin on each wake up, while event-driven backends register
+    every device with the event loop selector and only read devices that
+    have input pending.  Thread count and wake ups therefore stay flat as
+    joypads are added.
+
+    Changes are only reported once they have settled (see
+    :data:`debounce`).
+
+    Signals
+    -------
+    state-changed
+        Sent with :class:`joypad_state.StateChange` message on every settled
+        state change.  The joypad is identified by the message ``device_id``.
+        Messages are stamped with the monotonic time the state was
+        ``sampled``, ``settled`` and ``dispatched``.
+    buttons-changed
+        Sent with the same message if any buttons changed state.
+    device-connected
+        Sent with ``{'device_id': <joy_id>}`` when a device is opened,
+        including after it was plugged back in.
+    device-disconnected
+        Sent with ``{'device_id': <joy_id>}`` when a device is no longer
+        available (e.g., unplugged).
+
+    Parameters
+    ----------
+    signals : blinker.Namespace
+        Namespace to send signals through.
+    joy_ids : list
+        Joypad device identifiers.
+    poll_interval : float, optional
+        Seconds between reads of polling backends while any joypad is active.
+    settle_duration : float, optional
+        Seconds a changed input must persist before it is reported.
+    backend : backends.JoypadBackend, optional
+        Joypad backend (default: :func:`backends.get_backend`).
+
+        Event-driven backends are waited on through the event loop selector,
+        so the coroutine only wakes up when input is pending (or when a
+        pending state change is due to settle).
+    debounce : str, optional
+        Debounce strategy (see :data:`filters.DEBOUNCERS`):
+
+         - ``'input'``: each button and axis settles independently, so a
+           noisy axis cannot delay button presses (see
+           :class:`filters.InputDebouncer`).
+         - ``'state'``: state is accepted once the whole state has differed
+           from the previous reported state for :data:`settle_duration`
+           (see :class:`filters.StateDebouncer`).
+    button_settle : dict, optional
+        Settle duration keyed by button number (``'input'`` debounce only).
+    axis_settle : dict, optional
+        Settle duration keyed by axis name (``'input'`` debounce only).
+    deadzone : float or dict, optional
+        If specified, quantize axes to negative/neutral/positive zones before
+        debouncing, so only zone transitions are reported (see
+        :class:`filters.AxisZoneFilter`).
+    hysteresis : float, optional
+        Zone hysteresis (see :class:`filters.AxisZoneFilter`).
+    axis_levels : int, optional
+        Number of zone magnitude levels beyond the deadzone (see
+        :class:`filters.AxisZoneFilter`).
+    mappings : dict, optional
+        :class:`joypad_state.ButtonMapping` to apply to states of each joypad,
+        keyed by device identifier.
+    recorders : dict, optional
+        :class:`joypad_trace.TraceRecorder` keyed by device identifier.  Every
+        new state read from a recorded device is written to its recorder
+        (e.g., to replay later using :class:`joypad_trace.ReplayBackend`).
+    governor : PollRateGovernor, optional
+        Poll rate governor (default: :class:`PollRateGovernor` with
+        :data:`poll_interval` as fast interval).  Also records wake up
+        metrics for event-driven backends.
+    backoff_factory : callable, optional
+        Called with no arguments to create the :class:`ReconnectBackoff` of
+        each joypad, i.e., delay between probes while device is disconnected.
+        Probes use the backend's :meth:`backends.JoypadBackend.is_available`
+        check, so a disconnected device costs at most a few cheap calls per
+        second.
+    dispatcher : dispatch.SignalDispatcher, optional
+        If specified, signals are queued to be sent by the dispatcher worker
+        thread, so slow receivers cannot stall sampling.  Otherwise, signals
+        are sent directly from the polling loop.
+    '''
+    if backend is None:
+        backend = get_backend()
+    if governor is None:
+        governor = PollRateGovernor(poll_interval)
+    mappings = mappings or {}
+    recorders = recorders or {}
+    if debounce == 'input':
+        debouncer_factory = lambda: InputDebouncer(settle_duration,
+                                                   button_settle, axis_settle)
+    elif debounce == 'state':
+        debouncer_factory = lambda: StateDebouncer(settle_duration)
+    else:
+        raise ValueError('Unknown debounce strategy `%s`.  Available '
+                         'strategies: %s' % (debounce,
+                                             ', '.join(sorted(DEBOUNCERS))))
+    event_driven = backend.event_driven
+    loop = asyncio.get_event_loop()
+    readable = asyncio.Event()
+    monitors = [_MonitoredDevice(joy_id, mappings.get(joy_id),
+                                 None if deadzone is None else
+                                 AxisZoneFilter(deadzone, hysteresis,
+                                                axis_levels),
+                                 recorders.get(joy_id), backoff_factory(),
+                                 debouncer_factory(), readable)
+                for joy_id in joy_ids]
+
+    def _close(monitor):
+        if event_driven:
+            loop.remove_reader(monitor.device.fileno())
+        monitor.device.close()
+        monitor.device = None
+        monitor.state = None
+
+    try:
+        while True:
+            now = monotonic()
+            active = False
+            for monitor in monitors:
+                if monitor.device is None:
+                    if now < monitor.next_probe:
+                        continue
+                    if backend.is_available(monitor.joy_id):
+                        try:
+                            monitor.device = backend.open(monitor.joy_id)
+                        except IOError:
+                            pass
+                    if monitor.device is None:
+                        # Device is disconnected.
+                        monitor.next_probe = now + monitor.backoff.next()
+                        continue
+                    monitor.backoff.reset()
+                    monitor.ready = True
+                    if event_driven:
+                        loop.add_reader(monitor.device.fileno(),
+                                        monitor.set_ready)
+                    _send_signal(signals, dispatcher, 'device-connected',
+                                 {'device_id': monitor.joy_id})
+
+                changed = False
+                if monitor.ready or not event_driven:
+                    monitor.ready = False
+                    try:
+                        changed = monitor.device.read()
+                    except IOError:
+                        _close(monitor)
+                        monitor.next_probe = now + monitor.backoff.next()
+                        _send_signal(signals, dispatcher,
+                                     'device-disconnected',
+                                     {'device_id': monitor.joy_id})
+                        continue
+                if ((changed or monitor.state is None) and
+                        monitor.device.state is not None):
+                    # New state (or initial state read when device was
+                    # opened).
+                    state = monitor.device.state
+                    if monitor.recorder is not None:
+                        monitor.recorder.record(state)
+                    if monitor.mapping is not None:
+                        state = monitor.mapping.apply(state)
+                    if monitor.zone_filter is not None:
+                        state = monitor.zone_filter.apply(state)
+                    monitor.state = state
+
+                steady_state = monitor.debouncer.state
+                if monitor.debouncer.update(monitor.state, now):
+                    # Change has settled.
+                    message = StateChange(steady_state,
+                                          monitor.debouncer.state,
+                                          monitor.joy_id)
+                    message.settled = now
+                    _send_signal(signals, dispatcher, 'state-changed',
+                                 message)
+                active = active or changed or monitor.settling
+
+            interval = governor.update(active)
+            if not event_driven:
+                wake_time = monotonic() + interval
+                yield asyncio.From(asyncio.sleep(interval))
+                governor.record_jitter(monotonic() - wake_time)
+                continue
+
+            # Sleep until input is pending.  If a state change is waiting to
+            # settle, or a disconnected device is due to be probed, wake up
+            # when it is due.
+            readable.clear()
+            deadlines = [monitor.debouncer.deadline
+                         if monitor.device is not None else
+                         monitor.next_probe for monitor in monitors
+                         if monitor.device is None or monitor.settling]
+            if any(monitor.ready for monitor in monitors):
+                timeout = 0
+            elif deadlines:
+                timeout = max(0, min(deadlines) - monotonic())
+            else:
+                timeout = None
+            try:
+                yield asyncio.From(asyncio.wait_for(readable.wait(), timeout))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        for monitor in monitors:
+            if monitor.device is not None:
+                _close(monitor)
+
+
+@asyncio.coroutine
+def check_joypad(signals, joy_id, poll_interval=.001, settle_duration=.010,
+                 backend=None, recorder=None, governor=None, backoff=None,
+                 mapping=None, **kwargs):
+    '''
+    Monitor a single joypad and send signals when its state changes.
+
+    See :func:`check_joypads` for signals sent.
+
+    Parameters
+    ----------
+    signals : blinker.Namespace
+        Namespace to send signals through.
+    joy_id : int
+        Joypad device identifier.
+    recorder : joypad_trace.TraceRecorder, optional
+        If specified, every new state read from the device is recorded.
+    backoff : ReconnectBackoff, optional
+        Delay between probes while device is disconnected.
+    mapping : joypad_state.ButtonMapping, optional
+        Button mapping to apply to device states.
+    **kwargs
+        See :func:`check_joypads`.
+    '''
+    yield asyncio.From(check_joypads(
+        signals, [joy_id], poll_interval=poll_interval,
+        settle_duration=settle_duration, backend=backend,
+        mappings={joy_id: mapping} if mapping is not None else None,
+        recorders={joy_id: recorder} if recorder is not None else None,
+        governor=governor,
+        backoff_factory=(ReconnectBackoff if backoff is None
+                         else lambda: backoff), **kwargs))
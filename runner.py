@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from logging_helpers import _L
+
+
+class EventLoopThread(object):
+    '''
+    Run a coroutine on a long-lived event loop owned by a dedicated thread.
+
+    The loop is created once by :meth:`start` and kept running until
+    :meth:`stop`, so the coroutine's timers are serviced by a loop that is
+    not shared with (or torn down by) any other code.  :meth:`cancel` and
+    :meth:`stop` wait for the coroutine to finish, so any cleanup (e.g.,
+    closing devices) is complete when they return.
+
+    Parameters
+    ----------
+    name : str, optional
+        Thread name.
+    '''
+    def __init__(self, name='joypad-poller'):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._task = None
+        self._done = threading.Event()
+        self._done.set()
+
+    @property
+    def running(self):
+        '''
+        ``True`` if a coroutine is scheduled and has not finished.
+        '''
+        return not self._done.is_set()
+
+    def is_alive(self):
+        '''
+        Returns
+        -------
+        bool
+            ``True`` if the loop thread is running.
+        '''
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        '''
+        Start event loop thread.
+        '''
+        if self.is_alive():
+            raise RuntimeError('Event loop thread is already running.')
+        import trollius as asyncio
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=self.name,
+                                        args=(self.loop, ))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, loop):
+        import trollius as asyncio
+
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def run(self, coroutine_function, *args, **kwargs):
+        '''
+        Schedule coroutine on event loop.
+
+        Parameters
+        ----------
+        coroutine_function : function
+            Called in loop thread with :data:`args` and :data:`kwargs` to
+            create coroutine.
+        '''
+        if self.running:
+            raise RuntimeError('A coroutine is already running.')
+        self._done.clear()
+
+        def _on_done(task):
+            if not task.cancelled() and task.exception() is not None:
+                _L().error('Error running `%s`.', coroutine_function.__name__,
+                           exc_info=task.exception())
+            self._done.set()
+
+        def _create_task():
+            try:
+                coroutine = coroutine_function(*args, **kwargs)
+                self._task = self.loop.create_task(coroutine)
+            except Exception:
+                _L().error('Error starting `%s`.', coroutine_function.__name__,
+                           exc_info=True)
+                self._done.set()
+                return
+            self._task.add_done_callback(_on_done)
+
+        self.loop.call_soon_threadsafe(_create_task)
+
+    def cancel(self, timeout=None):
+        '''
+        Cancel coroutine and wait for it to finish.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum seconds to wait.
+
+        Returns
+        -------
+        bool
+            ``True`` if coroutine has finished.
+        '''
+        if not self.running:
+            return True
+
+        def _cancel():
+            if self._task is not None:
+                self._task.cancel()
+
+        self.loop.call_soon_threadsafe(_cancel)
+        return self._done.wait(timeout) or self._done.is_set()
+
+    def stop(self, timeout=None):
+        '''
+        Cancel coroutine, stop event loop, and join loop thread.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum seconds to wait for coroutine, and then for thread, to
+            finish.
+
+        Returns
+        -------
+        bool
+            ``True`` if loop thread has finished.
+        '''
+        if self._thread is None:
+            return True
+        if self._thread.is_alive():
+            self.cancel(timeout)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            if self._thread is not threading.current_thread():
+                self._thread.join(timeout)
+        if self._thread.is_alive():
+            return False
+        self._thread = None
+        self._task = None
+        self.loop = None
+        return True
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+'''
+Test configuration.
+
+The plugin directory is imported as the ``joypad_control_plugin`` package,
+with stand-ins for modules that are not installed (see :mod:`stand_ins`).
+'''
+import pytest
+
+import stand_ins
+
+stand_ins.install()
+
+
+@pytest.fixture
+def runner():
+    '''
+    Event loop thread to run poller coroutines on.
+    '''
+    from joypad_control_plugin.runner import EventLoopThread
+
+    runner = EventLoopThread('joypad-test-poller')
+    runner.start()
+    yield runner
+    assert runner.stop(5.)
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+'''
+Fake joypad devices and libraries shared by tests.
+'''
+import collections
+import fcntl
+import os
+import struct
+import threading
+import time
+
+from joypad_control_plugin.backends import JoypadBackend, JoypadDevice
+from joypad_control_plugin.joypad_state import JoypadState, monotonic
+
+
+class FakeWinMM(object):
+    '''
+    Stand-in for the WinMM joystick API (see
+    :func:`windows_joypad_interface.use_winmm`).
+
+    Structures passed by reference are filled in place, as WinMM does.
+
+    Attributes
+    ----------
+    devices : dict
+        ``{'x': ..., 'y': ..., 'z': ..., 'r': ..., 'u': ..., 'v': ...,
+        'pov': ..., 'buttons': ...}`` raw words of each plugged in joystick,
+        keyed by joystick id.
+    caps : int
+        ``JOYCAPS_*`` capability flags reported for each joystick.
+    calls : collections.Counter
+        Number of calls to each function.
+    '''
+    JOYERR_NOERROR = 0
+    JOYERR_UNPLUGGED = 167
+    # `(JOY_RETURN* flag, device key, JOYINFOEX field)` filled by
+    # `joyGetPosEx`.
+    EX_FIELDS = ((0x1, 'x', 'dwXpos'), (0x2, 'y', 'dwYpos'),
+                 (0x4, 'z', 'dwZpos'), (0x8, 'r', 'dwRpos'),
+                 (0x10, 'u', 'dwUpos'), (0x20, 'v', 'dwVpos'),
+                 (0x40 | 0x200, 'pov', 'dwPOV'),
+                 (0x80, 'buttons', 'dwButtons'))
+
+    def __init__(self, num_devs=16, num_buttons=12, caps=0):
+        self.num_devs = num_devs
+        self.num_buttons = num_buttons
+        self.caps = caps
+        self.devices = {}
+        self.calls = collections.Counter()
+
+    def plug(self, joy_id, x=32767, y=32767, buttons=0, z=32767, r=32767,
+             u=32767, v=32767, pov=0xFFFF):
+        self.devices[joy_id] = {'x': x, 'y': y, 'z': z, 'r': r, 'u': u,
+                                'v': v, 'pov': pov, 'buttons': buttons}
+
+    def unplug(self, joy_id):
+        self.devices.pop(joy_id, None)
+
+    def joyGetNumDevs(self):
+        self.calls['joyGetNumDevs'] += 1
+        return self.num_devs
+
+    def joyGetPos(self, joy_id, p_info):
+        self.calls['joyGetPos'] += 1
+        device = self.devices.get(joy_id)
+        if device is None:
+            return self.JOYERR_UNPLUGGED
+        info = p_info._obj
+        info.wXpos = device['x']
+        info.wYpos = device['y']
+        info.wButtons = device['buttons']
+        return self.JOYERR_NOERROR
+
+    def joyGetPosEx(self, joy_id, p_info):
+        self.calls['joyGetPosEx'] += 1
+        device = self.devices.get(joy_id)
+        if device is None:
+            return self.JOYERR_UNPLUGGED
+        info = p_info._obj
+        # Only fields selected by the flags are filled in.
+        for flag, key, field in self.EX_FIELDS:
+            if info.dwFlags & flag:
+                setattr(info, field, device[key])
+        return self.JOYERR_NOERROR
+
+    def joyGetDevCapsW(self, joy_id, p_caps, size):
+        self.calls['joyGetDevCapsW'] += 1
+        if joy_id not in self.devices:
+            return self.JOYERR_UNPLUGGED
+        caps = p_caps._obj
+        for axis in 'XYZRUV':
+            setattr(caps, 'w%smin' % axis, 0)
+            setattr(caps, 'w%smax' % axis, 65535)
+        caps.wNumButtons = self.num_buttons
+        caps.wCaps = self.caps
+        return self.JOYERR_NOERROR
+
+
+class FakeDevice(JoypadDevice):
+    '''
+    Polled device reporting the state set through its :class:`FakeBackend`.
+    '''
+    def __init__(self, device_id, backend):
+        self.device_id = device_id
+        self.backend = backend
+        self.state = None
+
+    def read(self):
+        self.backend.reads[self.device_id] += 1
+        state = self.backend.states.get(self.device_id)
+        if state is None:
+            raise IOError('Fake joypad %d unplugged.' % self.device_id)
+        if state == self.state:
+            return False
+        self.state = state
+        return True
+
+    def close(self):
+        self.backend.closed[self.device_id] += 1
+
+
+class FakeBackend(JoypadBackend):
+    '''
+    Polling backend of fake joypads.
+
+    Attributes
+    ----------
+    states : dict
+        Current state of each plugged in joypad, keyed by device id.
+    probes, reads, opened, closed : collections.Counter
+        Number of availability checks, reads, opens and closes of each
+        joypad.
+    '''
+    event_driven = False
+    device_class = FakeDevice
+
+    def __init__(self, num_buttons=12):
+        self.num_buttons = num_buttons
+        self.states = {}
+        self.probes = collections.Counter()
+        self.reads = collections.Counter()
+        self.opened = collections.Counter()
+        self.closed = collections.Counter()
+
+    def set_state(self, device_id, buttons=0, axes=(0., 0.)):
+        '''
+        Plug in joypad (if necessary) and set its state.
+        '''
+        self.states[device_id] = JoypadState(buttons, tuple(axes),
+                                             self.num_buttons, monotonic())
+
+    plug = set_state
+
+    def unplug(self, device_id):
+        self.states.pop(device_id, None)
+
+    def enumerate(self):
+        return sorted(self.states)
+
+    def is_available(self, device_id):
+        self.probes[device_id] += 1
+        return device_id in self.states
+
+    def open(self, device_id):
+        if device_id not in self.states:
+            raise IOError('Fake joypad %d unplugged.' % device_id)
+        self.opened[device_id] += 1
+        device = self.device_class(device_id, self)
+        device.read()
+        return device
+
+
+#: State record written to :class:`PipeDevice` pipes: button mask and two
+#: axes.
+PIPE_RECORD = struct.Struct('<Iff')
+
+
+class PipeDevice(FakeDevice):
+    '''
+    Event-driven fake device; its :meth:`fileno` is the read end of a pipe
+    its :class:`PipeBackend` writes state records to.
+    '''
+    def __init__(self, device_id, backend):
+        FakeDevice.__init__(self, device_id, backend)
+        self._fd, backend.write_fds[device_id] = os.pipe()
+        fcntl.fcntl(self._fd, fcntl.F_SETFL,
+                    fcntl.fcntl(self._fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        self._raw = backend.states[device_id]
+
+    def fileno(self):
+        return self._fd
+
+    def read(self):
+        self.backend.reads[self.device_id] += 1
+        try:
+            data = os.read(self._fd, 64 * PIPE_RECORD.size)
+        except OSError:
+            # Nothing pending.
+            data = None
+        if data == b'':
+            raise IOError('Fake joypad %d unplugged.' % self.device_id)
+        if data:
+            buttons, x, y = PIPE_RECORD.unpack_from(data, len(data) -
+                                                    PIPE_RECORD.size)
+            self._raw = JoypadState(buttons, (x, y), self.backend.num_buttons,
+                                    monotonic())
+        if self._raw == self.state:
+            return False
+        self.state = self._raw
+        return True
+
+    def close(self):
+        FakeDevice.close(self)
+        os.close(self._fd)
+
+
+class PipeBackend(FakeBackend):
+    '''
+    Event-driven backend of fake joypads backed by pipes, so the poller
+    waits on real file descriptors.
+    '''
+    event_driven = True
+    device_class = PipeDevice
+
+    def __init__(self, num_buttons=12):
+        FakeBackend.__init__(self, num_buttons)
+        self.write_fds = {}
+
+    def set_state(self, device_id, buttons=0, axes=(0., 0.)):
+        FakeBackend.set_state(self, device_id, buttons, axes)
+        fd = self.write_fds.get(device_id)
+        if fd is not None:
+            os.write(fd, PIPE_RECORD.pack(buttons, *axes))
+
+    plug = set_state
+
+    def unplug(self, device_id):
+        FakeBackend.unplug(self, device_id)
+        fd = self.write_fds.pop(device_id, None)
+        if fd is not None:
+            os.close(fd)
+
+
+class RawRecorder(object):
+    '''
+    Record raw states read by the poller (see `recorders` argument of
+    :func:`poller.check_joypads`).
+    '''
+    def __init__(self):
+        self.states = []
+
+    def record(self, state):
+        self.states.append(state)
+
+
+class RecordingSignals(object):
+    '''
+    Signal namespace (see :class:`blinker.Namespace`) recording each sent
+    signal as a ``(name, message)`` pair in :attr:`sent`.
+    '''
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def signal(self, name):
+        return _RecordingSignal(self, name)
+
+    def record(self, name, message):
+        with self._lock:
+            self.sent.append((name, message))
+
+    def messages(self, name):
+        with self._lock:
+            return [message for name_, message in self.sent
+                    if name_ == name]
+
+    def wait_for(self, predicate, timeout=2.):
+        '''
+        Wait until :data:`predicate` returns ``True``.
+
+        Returns
+        -------
+        bool
+            ``False`` if timed out.
+        '''
+        return wait_until(lambda: predicate(self), timeout)
+
+
+class _RecordingSignal(object):
+    def __init__(self, signals, name):
+        self.signals = signals
+        self.name = name
+
+    def send(self, message):
+        self.signals.record(self.name, message)
+
+
+def wait_until(predicate, timeout=2., interval=.005):
+    '''
+    Returns
+    -------
+    bool
+        ``True`` once :data:`predicate` returns ``True``, or ``False`` if
+        timed out.
+    '''
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        time.sleep(interval)
+    return True
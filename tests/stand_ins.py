@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+'''
+Stand-ins for MicroDrop host modules (and other runtime dependencies) that
+are not installed, so the plugin directory can be imported as the
+``joypad_control_plugin`` package outside of MicroDrop, e.g., on a build
+server (see :func:`install`).
+'''
+import logging
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'joypad_control_plugin'
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+class _StandIns(object):
+    '''
+    Import hook providing stand-ins for modules that are not installed.
+
+    Appended to :data:`sys.meta_path`, so installed modules always take
+    precedence, and stand-ins are only created when imported.
+    '''
+    def __init__(self, factories):
+        self.factories = factories
+
+    def find_spec(self, name, path=None, target=None):
+        if name in self.factories:
+            import importlib.util
+
+            return importlib.util.spec_from_loader(name, self)
+
+    def is_package(self, name):
+        return any(other.startswith(name + '.') for other in self.factories)
+
+    def create_module(self, spec):
+        return self.factories[spec.name]()
+
+    def exec_module(self, module):
+        pass
+
+    def find_module(self, name, path=None):
+        # Python 2.
+        return self if name in self.factories else None
+
+    def load_module(self, name):
+        if name not in sys.modules:
+            sys.modules[name] = self.factories[name]()
+        return sys.modules[name]
+
+
+class _Coroutine(object):
+    '''
+    Run a ``trollius``-style generator coroutine (i.e., ``yield From(...)``)
+    as a standard library :mod:`asyncio` coroutine.
+    '''
+    def __init__(self, generator):
+        self._generator = generator
+        self._awaiting = None
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+    next = __next__
+
+    def send(self, value):
+        return self._step(value, None)
+
+    def throw(self, type_, value=None, traceback=None):
+        if value is None:
+            value = type_() if isinstance(type_, type) else type_
+        return self._step(None, value)
+
+    def close(self):
+        if self._awaiting is not None and hasattr(self._awaiting, 'close'):
+            self._awaiting.close()
+        self._generator.close()
+
+    def _step(self, value, exception):
+        while True:
+            if self._awaiting is not None:
+                try:
+                    if exception is not None:
+                        return self._awaiting.throw(exception)
+                    return self._awaiting.send(value)
+                except StopIteration as stop:
+                    value = getattr(stop, 'value', None)
+                    exception = None
+                except BaseException as raised:
+                    value = None
+                    exception = raised
+                self._awaiting = None
+            if exception is not None:
+                awaitable = self._generator.throw(exception)
+            else:
+                awaitable = self._generator.send(value)
+            self._awaiting = awaitable.__await__()
+            value = exception = None
+
+
+def _trollius():
+    import asyncio
+    import collections.abc
+    import functools
+    import inspect
+
+    collections.abc.Coroutine.register(_Coroutine)
+
+    def coroutine(function):
+        @functools.wraps(function)
+        def _coroutine(*args, **kwargs):
+            result = function(*args, **kwargs)
+            if inspect.isgenerator(result):
+                return _Coroutine(result)
+            return result
+        return _coroutine
+
+    module = _module('trollius', From=lambda value: value,
+                     coroutine=coroutine)
+    for name in ('CancelledError', 'Event', 'TimeoutError', 'get_event_loop',
+                 'new_event_loop', 'set_event_loop', 'sleep', 'wait_for'):
+        setattr(module, name, getattr(asyncio, name))
+    return module
+
+
+class _Signal(object):
+    def __init__(self, name):
+        self.name = name
+        self.receivers = []
+
+    def connect(self, receiver, weak=True):
+        self.receivers.append(receiver)
+        return receiver
+
+    def disconnect(self, receiver):
+        self.receivers.remove(receiver)
+
+    def send(self, *args, **kwargs):
+        return [(receiver, receiver(*args, **kwargs))
+                for receiver in list(self.receivers)]
+
+
+class _Namespace(dict):
+    def signal(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            return self.setdefault(name, _Signal(name))
+
+
+class _Field(object):
+    def named(self, name):
+        return self
+
+    def using(self, **kwargs):
+        return self
+
+    def of(self, *fields):
+        return self
+
+
+class _AppDataController(object):
+    #: App option values returned by :meth:`get_app_values`.
+    app_values = {}
+
+    def on_plugin_enable(self):
+        pass
+
+    def get_app_values(self):
+        return dict(self.app_values)
+
+
+def _hub_execute_async(target, command, callback=None, **kwargs):
+    raise RuntimeError('No hub in tests; patch `hub_execute_async`.')
+
+
+def _decode_content_data(response):
+    content = response['content']
+    if content.get('error') is not None:
+        raise RuntimeError(content['error'])
+    return content.get('data')
+
+
+class _Plugin(object):
+    pass
+
+
+class _PluginGlobals(object):
+    @staticmethod
+    def push_env(name):
+        pass
+
+    @staticmethod
+    def pop_env():
+        pass
+
+
+#: Stand-in module factories, keyed by module name.
+STAND_INS = {
+    'logging_helpers': lambda: _module('logging_helpers',
+                                       _L=lambda: logging.getLogger(PACKAGE)),
+    'trollius': _trollius,
+    'blinker': lambda: _module('blinker', Namespace=_Namespace,
+                               Signal=_Signal),
+    'flatland': lambda: _module('flatland', Form=_Field(), String=_Field()),
+    'zmq_plugin': lambda: _module('zmq_plugin', __path__=[]),
+    'zmq_plugin.schema':
+    lambda: _module('zmq_plugin.schema',
+                    decode_content_data=_decode_content_data),
+    'microdrop': lambda: _module('microdrop', __path__=[]),
+    'microdrop.interfaces': lambda: _module('microdrop.interfaces',
+                                            IPlugin=object),
+    'microdrop.plugin_helpers':
+    lambda: _module('microdrop.plugin_helpers',
+                    AppDataController=_AppDataController,
+                    hub_execute_async=_hub_execute_async),
+    'microdrop.plugin_manager':
+    lambda: _module('microdrop.plugin_manager', PluginGlobals=_PluginGlobals,
+                    Plugin=_Plugin, implements=lambda interface: None),
+}
+
+
+def _import_package():
+    if PACKAGE in sys.modules:
+        return sys.modules[PACKAGE]
+    try:
+        import importlib.util
+    except ImportError:
+        # Python 2.
+        import imp
+
+        return imp.load_module(PACKAGE, None, ROOT,
+                               ('', '', imp.PKG_DIRECTORY))
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE, os.path.join(ROOT, '__init__.py'),
+        submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def install():
+    '''
+    Register stand-ins for modules that are not installed and import the
+    plugin package.
+
+    Returns
+    -------
+    module
+        ``joypad_control_plugin`` package.
+    '''
+    if not any(isinstance(finder, _StandIns) for finder in sys.meta_path):
+        sys.meta_path.append(_StandIns(STAND_INS))
+    return _import_package()
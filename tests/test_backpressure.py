@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import time
+
+from joypad_control_plugin.backpressure import (DirectionCoalescer,
+                                                InFlightTracker)
+
+TARGET = 'microdrop.electrode_controller_plugin'
+
+
+def test_late_reply_does_not_acknowledge_newer_command():
+    tracker = InFlightTracker(timeout=2.)
+    expired = tracker.issue(TARGET, now=0.)
+    assert tracker.count(TARGET, now=3.) == 0
+    newer = tracker.issue(TARGET, now=3.)
+    tracker.acknowledge(TARGET, expired)
+    assert tracker.count(TARGET, now=3.) == 1
+    assert tracker.metrics()['late'] == 1
+    tracker.acknowledge(TARGET, newer)
+    assert tracker.count(TARGET, now=3.) == 0
+
+
+def test_directions_coalesced_while_busy():
+    tracker = InFlightTracker()
+    issued = []
+
+    def _execute(message, target, command, token=None, **kwargs):
+        issued.append((token, kwargs['direction']))
+
+    directions = DirectionCoalescer(_execute, tracker)
+    assert directions.move('left')
+    assert not directions.move('up')
+    assert not directions.move('right')
+    assert [direction for token, direction in issued] == ['left']
+    # Last pending direction is issued once the target replies.
+    tracker.acknowledge(TARGET, issued[0][0])
+    assert [direction for token, direction in issued] == ['left', 'right']
+    assert directions.coalesced == 1
+    directions.close()
+
+
+def test_pending_direction_issued_once_command_expires():
+    tracker = InFlightTracker(timeout=.05)
+    issued = []
+
+    def _execute(message, target, command, token=None, **kwargs):
+        # Target never replies.
+        issued.append(kwargs['direction'])
+
+    directions = DirectionCoalescer(_execute, tracker)
+    assert directions.move('right')
+    assert not directions.move('left')
+    assert directions.busy
+    time.sleep(.1)
+    # Previous command expired; pending direction is issued (and is now in
+    # flight).
+    assert directions.busy
+    assert issued == ['right', 'left']
+    assert not directions.pending
+    time.sleep(.1)
+    assert not directions.busy
+    directions.close()
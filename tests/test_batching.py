@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    # Python 2.
+    import Queue as queue
+
+from joypad_control_plugin.batching import (BATCH_COMMAND, BatchExecutor,
+                                            CommandBatch)
+from joypad_control_plugin.joypad_state import monotonic
+
+TARGET = 'microdrop.electrode_controller_plugin'
+
+
+class _StandInHub(object):
+    '''
+    Stand-in hub serving a fake electrode controller.
+
+    Requests are served in order by a worker thread, each taking
+    :data:`round_trip` seconds.
+
+    Attributes
+    ----------
+    requests : int
+        Number of requests served, i.e., round trips.
+    all_off : float
+        Seconds all electrodes were off after having been on.
+    '''
+    def __init__(self, round_trip=.005, batch_capable=True):
+        self.round_trip = round_trip
+        self.batch_capable = batch_capable
+        self.electrodes = set(['electrode000'])
+        self.requests = 0
+        self.all_off = 0.
+        self._off_since = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def execute(self, message, target, command, callback=None, **kwargs):
+        self._queue.put((command, kwargs, callback))
+
+    def join(self):
+        self._queue.put(None)
+        self._thread.join(5.)
+
+    def _apply(self, command, kwargs):
+        if command == 'clear_electrode_states':
+            self.electrodes.clear()
+        elif command == 'set_electrode_states':
+            self.electrodes.update(kwargs['electrode_states'])
+        elif command == BATCH_COMMAND and self.batch_capable:
+            for command_i in kwargs['commands']:
+                self._apply(command_i['command'], command_i['kwargs'])
+        else:
+            raise RuntimeError('Unknown command `%s`.' % command)
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            command, kwargs, callback = request
+            time.sleep(self.round_trip)
+            self.requests += 1
+            try:
+                self._apply(command, kwargs)
+                content = {'data': None}
+            except RuntimeError as exception:
+                content = {'error': str(exception)}
+            now = monotonic()
+            if self.electrodes and self._off_since is not None:
+                self.all_off += now - self._off_since
+                self._off_since = None
+            elif not self.electrodes and self._off_since is None:
+                self._off_since = now
+            if callback is not None:
+                callback({'content': content})
+
+
+def _actuate(executor, electrode_id):
+    batch = CommandBatch(TARGET)
+    batch.add('clear_electrode_states')
+    batch.add('set_electrode_states', electrode_states={electrode_id: 1})
+    executor(None, batch)
+
+
+def test_bench_batch_round_trips():
+    '''
+    Report round trips and time all electrodes are off while moving the
+    actuated electrode, with the electrode controller declared batch
+    capable and not.
+    '''
+    moves = 20
+    results = {}
+    for name, targets in (('batch', [TARGET]), ('sequential', [])):
+        hub = _StandInHub()
+        executor = BatchExecutor(hub.execute, targets)
+        for i in range(moves):
+            _actuate(executor, 'electrode%03d' % i)
+        hub.join()
+        results[name] = hub, executor.metrics()
+    for name, (hub, metrics) in sorted(results.items()):
+        print('%-10s %d moves: %d round trips, electrodes all off for '
+              '%.1f ms' % (name, moves, hub.requests, 1e3 * hub.all_off))
+    batch, metrics = results['batch']
+    assert batch.requests == moves
+    assert batch.all_off == 0
+    assert metrics['batches'] == moves
+    sequential, metrics = results['sequential']
+    assert sequential.requests == 2 * moves
+    assert sequential.all_off >= moves * sequential.round_trip
+    assert metrics['sequential'] == moves
+
+
+def test_undeclared_target_not_sent_batches():
+    # Target would reject the batch command.
+    hub = _StandInHub(round_trip=0, batch_capable=False)
+    executor = BatchExecutor(hub.execute)
+    replies = []
+    batch = CommandBatch(TARGET).add('clear_electrode_states')
+    batch.add('set_electrode_states', electrode_states={'electrode001': 1})
+    executor(None, batch, callback=replies.append)
+    hub.join()
+    assert replies == [{'content': {'data': None}}]
+    assert hub.electrodes == set(['electrode001'])
+    assert executor.metrics() == {'batches': 0, 'sequential': 1,
+                                  'targets': []}
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from joypad_control_plugin.bindings import compile_bindings
+
+
+def _table(bindings):
+    actions = dict((name, lambda message, name=name: name)
+                   for name in ('a', 'b', 'c'))
+    return compile_bindings(bindings, actions)
+
+
+def test_most_specific_wins():
+    table = _table([{'buttons': [4], 'action': 'a'},
+                    {'buttons': [4], 'modifiers': [8], 'action': 'b'}])
+    assert table.lookup(0, 1 << 4).action == 'a'
+    assert table.lookup(1 << 8, 1 << 8 | 1 << 4).action == 'b'
+
+
+def test_buttons_beyond_32():
+    table = _table([{'buttons': [0], 'on': 'release', 'action': 'a'},
+                    {'buttons': [32], 'action': 'b'},
+                    {'buttons': [100], 'modifiers': [40], 'action': 'c'}])
+    assert table.lookup(1, 0).action == 'a'
+    # Would share a key with the release above if masks were packed into
+    # 32 bits each.
+    assert table.lookup(0, 1 << 32).action == 'b'
+    assert table.lookup(1 << 40, 1 << 40 | 1 << 100).action == 'c'
+    assert table.lookup(0, 1 << 100) is None
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import io
+import time
+
+from joypad_control_plugin.filters import InputDebouncer
+from joypad_control_plugin.joypad_state import JoypadState
+from joypad_control_plugin.joypad_trace import ReplayBackend, TraceRecorder
+from joypad_control_plugin.poller import check_joypads
+from fakes import RawRecorder, RecordingSignals
+
+
+def _state(buttons=0, x=0., num_buttons=12):
+    return JoypadState(buttons, (x, 0.), num_buttons)
+
+
+def test_noisy_axis_does_not_delay_buttons():
+    debouncer = InputDebouncer(.010)
+    assert debouncer.update(_state(), 0.)
+    debouncer.update(_state(0b1, x=.1), .001)
+    for i in range(2, 12):
+        # Axis changes every millisecond, so it never settles.
+        debouncer.update(_state(0b1, x=.1 * (i % 2)), .001 * i)
+    assert debouncer.state.buttons == 0b1
+    assert debouncer.state.axes == (0., 0.)
+
+
+def test_buttons_beyond_32():
+    debouncer = InputDebouncer(.010, button_settle={40: .002})
+    debouncer.update(_state(num_buttons=64), 0.)
+    debouncer.update(_state(1 << 40 | 1 << 10, num_buttons=64), .001)
+    assert debouncer.update(_state(1 << 40 | 1 << 10, num_buttons=64), .003)
+    assert debouncer.state.buttons == 1 << 40
+    # Button numbers beyond those reported by the device.
+    debouncer.update(_state(1 << 200 | 1 << 40 | 1 << 10, num_buttons=64),
+                     .004)
+    assert debouncer.update(_state(1 << 200 | 1 << 40 | 1 << 10,
+                                   num_buttons=64), .020)
+    assert debouncer.state.buttons == 1 << 200 | 1 << 40 | 1 << 10
+
+
+def _press_trace(duration=.6, period=.1, press_duration=.04, noise=.002):
+    '''
+    Returns
+    -------
+    bytes
+        Trace sampled every millisecond of button 0 pressed every
+        :data:`period` seconds, while the X axis alternates between two
+        values every :data:`noise` seconds (e.g., stick resting near the
+        deadzone edge).
+    '''
+    output = io.BytesIO()
+    recorder = TraceRecorder(output)
+    for i in range(int(duration * 1000)):
+        t = i * .001
+        pressed = (t % period) >= period - press_duration
+        x = .2 if int(t / noise) % 2 else .21
+        recorder.record(JoypadState(int(pressed), (x, 0.), 12, t))
+    return output.getvalue()
+
+
+def test_bench_press_to_signal(runner):
+    '''
+    Report press-to-signal latency on a replayed trace with each debounce
+    strategy.
+    '''
+    trace = _press_trace()
+    results = {}
+    for name, kwargs in (('state', {'debounce': 'state'}),
+                         ('input', {'debounce': 'input'}),
+                         ('input 2ms', {'debounce': 'input',
+                                        'button_settle': {0: .002}})):
+        signals = RecordingSignals()
+        raw = RawRecorder()
+        backend = ReplayBackend(io.BytesIO(trace))
+        runner.run(check_joypads, signals, [0], backend=backend,
+                   recorders={0: raw}, **kwargs)
+        time.sleep(.7)
+        assert runner.cancel(5.)
+        presses = [message for message in signals.messages('state-changed')
+                   if message.old is not None and message.changed & 1 and
+                   message.new.buttons & 1]
+        latencies = []
+        for message in presses:
+            sampled = max(state.timestamp for state in raw.states
+                          if state.buttons & 1 and
+                          state.timestamp <= message.settled)
+            # Time of first sample of this press.
+            for state in reversed(raw.states):
+                if state.timestamp > sampled:
+                    continue
+                if not state.buttons & 1:
+                    break
+                sampled = state.timestamp
+            latencies.append(message.settled - sampled)
+        results[name] = presses, latencies
+    for name, (presses, latencies) in sorted(results.items()):
+        print('%-9s %d presses, press-to-signal mean %.1f ms, max %.1f ms' %
+              (name, len(presses), 1e3 * sum(latencies) / len(latencies),
+               1e3 * max(latencies)))
+    for presses, latencies in results.values():
+        assert len(presses) == 6
+
+
+def test_accepted_state_stamped_with_change_sample_time():
+    debouncer = InputDebouncer(.010)
+    debouncer.update(JoypadState(0, (0., 0.), 12, .990), .990)
+    debouncer.update(JoypadState(0b1, (0., 0.), 12, 1.), 1.0001)
+    debouncer.update(JoypadState(0b11, (0., 0.), 12, 1.006), 1.0061)
+    assert debouncer.update(JoypadState(0b11, (0., 0.), 12, 1.010), 1.0101)
+    # Only button 0 has settled; stamped with the sample it was pressed in.
+    assert debouncer.state.buttons == 0b1
+    assert debouncer.state.timestamp == 1.
+    assert debouncer.update(JoypadState(0b11, (0., 0.), 12, 1.016), 1.0161)
+    assert debouncer.state.buttons == 0b11
+    assert debouncer.state.timestamp == 1.006
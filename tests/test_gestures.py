@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import collections
+import io
+import time
+
+import blinker
+
+from joypad_control_plugin.bindings import compile_bindings
+from joypad_control_plugin.gestures import GestureRecognizer
+from joypad_control_plugin.joypad_state import (JoypadState, StateChange,
+                                                monotonic)
+from joypad_control_plugin.joypad_trace import ReplayBackend, TraceRecorder
+from joypad_control_plugin.poller import check_joypads
+from joypad_control_plugin.timers import TimerWheel
+from fakes import RawRecorder
+
+
+class _Wheel(object):
+    def __init__(self):
+        self.scheduled = []
+
+    def schedule(self, delay, callback):
+        self.scheduled.append((delay, callback))
+
+
+def _change(old, new, timestamp):
+    return StateChange(JoypadState(old, (0., 0.), 64),
+                       JoypadState(new, (0., 0.), 64, timestamp), 0)
+
+
+def test_double_tap_beyond_32():
+    triggered = []
+    table = compile_bindings([{'buttons': [40], 'on': 'double-tap',
+                               'action': 'a'}],
+                             {'a': lambda message: triggered.append(message)})
+    gestures = GestureRecognizer(table, _Wheel())
+    for old, new, t in ((0, 1 << 40, 0.), (1 << 40, 0, .05),
+                        (0, 1 << 40, .1)):
+        gestures.update(_change(old, new, t))
+    assert len(triggered) == 1
+
+
+def _gesture_trace(cycles=2, period=.7):
+    '''
+    Returns
+    -------
+    bytes
+        Trace sampled every millisecond of button 0 tapped twice (pressed
+        at .05 and .15 s of each cycle) and then held from .3 to .6 s.
+    '''
+    output = io.BytesIO()
+    recorder = TraceRecorder(output)
+    presses = ((.05, .09), (.15, .19), (.3, .6))
+    for i in range(int(cycles * period * 1000)):
+        t = i * .001
+        pressed = any(start <= t % period < end for start, end in presses)
+        recorder.record(JoypadState(int(pressed), (0., 0.), 12, t))
+    return output.getvalue()
+
+
+def test_bench_press_to_gesture(runner):
+    '''
+    Report latency from the trace sample that completes each gesture to
+    its binding being triggered, replaying a trace through the poller,
+    signal and timer wheel (i.e., as in the plugin).
+    '''
+    cycles, period, hold_duration = 2, .7, .2
+    triggered = []
+    actions = dict((gesture, lambda message, gesture=gesture:
+                    triggered.append((gesture, monotonic())))
+                   for gesture in ('double-tap', 'hold', 'long-press'))
+    table = compile_bindings([{'buttons': [0], 'on': gesture,
+                               'action': gesture} for gesture in actions],
+                             actions)
+    wheel = TimerWheel()
+    wheel.start()
+    gestures = GestureRecognizer(table, wheel, hold_duration=hold_duration,
+                                 double_tap_interval=.2)
+    signals = blinker.Namespace()
+    signals.signal('buttons-changed').connect(gestures.update, weak=False)
+    raw = RawRecorder()
+    runner.run(check_joypads, signals, [0],
+               backend=ReplayBackend(io.BytesIO(_gesture_trace(cycles,
+                                                               period))),
+               recorders={0: raw})
+    time.sleep(cycles * period + .1)
+    assert runner.cancel(5.)
+    assert wheel.stop(5.)
+
+    # Trace time of the sample completing each gesture.
+    due = {'double-tap': .15, 'hold': .3 + hold_duration, 'long-press': .6}
+    start = raw.states[0].timestamp
+    latencies = collections.defaultdict(list)
+    for i, (gesture, triggered_at) in enumerate(triggered):
+        cycle = i // len(due)
+        latencies[gesture].append(triggered_at - start - cycle * period -
+                                  due[gesture])
+    for gesture, values in sorted(latencies.items()):
+        print('%-10s %d gestures, latency mean %.1f ms, max %.1f ms' %
+              (gesture, len(values), 1e3 * sum(values) / len(values),
+               1e3 * max(values)))
+    assert [gesture for gesture, triggered_at in triggered] == \
+        cycles * ['double-tap', 'hold', 'long-press']
+    for values in latencies.values():
+        assert 0 < max(values) < .1
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from joypad_control_plugin.history import MAX_BUTTONS, EventHistory
+from joypad_control_plugin.joypad_state import JoypadState, StateChange
+
+
+def _change(old, new, timestamp):
+    return StateChange(JoypadState(old, (0., 0.), 64),
+                       JoypadState(new, (0., 0.), 64, timestamp), 0)
+
+
+def test_buttons_beyond_32():
+    history = EventHistory(capacity=4)
+    history.append(_change(0, 1 << 40 | 1, 1.))
+    history.append(_change(1 << 40 | 1, 1 << 63 | 1, 2.))
+    assert [record.buttons for record in history.query()] == \
+        [1 << 40 | 1, 1 << 63 | 1]
+    assert [record.timestamp for record in history.query(button=40)] == \
+        [1., 2.]
+    assert history.presses(10., now=2.) == [(1., 0, 0), (1., 0, 40),
+                                             (2., 0, 63)]
+    assert history.query(button=63)[0].released == 1 << 40
+    with pytest.raises(ValueError):
+        history.query(button=MAX_BUTTONS)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import fcntl
+import os
+import time
+
+import pytest
+
+from joypad_control_plugin import linux_joypad_interface as lji
+
+BTN_TRIGGER = lji.BTN_JOYSTICK
+
+
+class PipeEvdevDevice(lji.EvdevDevice):
+    '''
+    Evdev device reading events written to a pipe.
+
+    :meth:`_sync` reads :attr:`kernel_buttons` (i.e., the device state the
+    kernel would report) instead of querying the device.
+    '''
+    def __init__(self, monotonic_timestamps=True):
+        self.device_id = 0
+        self._fd, self.write_fd = os.pipe()
+        fcntl.fcntl(self._fd, fcntl.F_SETFL,
+                    fcntl.fcntl(self._fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        self.monotonic_timestamps = monotonic_timestamps
+        self._clock_offset = (0. if monotonic_timestamps else
+                              lji._clock_offset(monotonic_timestamps))
+        self._button_numbers = {BTN_TRIGGER: 0, BTN_TRIGGER + 1: 1}
+        self._axis_indexes = {}
+        self._axis_factors = {}
+        self._buttons = 0
+        self._axes = [0.] * len(lji.AXIS_NAMES)
+        self.kernel_buttons = 0
+        self._dirty = False
+        self._dropping = False
+        self.state = self._build_state(0.)
+
+    def _sync(self):
+        self._buttons = self.kernel_buttons
+        self._dirty = True
+
+    def write(self, *events, **kwargs):
+        timestamp = kwargs.get('timestamp', 1.)
+        seconds = int(timestamp)
+        microseconds = int(round(1e6 * (timestamp - seconds)))
+        os.write(self.write_fd,
+                 b''.join(lji.INPUT_EVENT.pack(seconds, microseconds, type_,
+                                               code, value)
+                          for type_, code, value in events))
+
+    def close(self):
+        lji.EvdevDevice.close(self)
+        os.close(self.write_fd)
+
+
+@pytest.fixture
+def device():
+    device = PipeEvdevDevice()
+    yield device
+    device.close()
+
+
+def _report():
+    return (lji.EV_SYN, lji.SYN_REPORT, 0)
+
+
+def test_state_built_per_report(device):
+    device.write((lji.EV_KEY, BTN_TRIGGER, 1), _report())
+    assert device.read()
+    assert device.state.buttons == 0b1
+    assert device.state.timestamp == 1.
+
+
+def test_events_discarded_after_dropped(device):
+    # Button 0 was pressed and released; the kernel dropped events, so the
+    # buffered press is stale.
+    device.kernel_buttons = 0b10
+    device.write((lji.EV_SYN, lji.SYN_DROPPED, 0),
+                 (lji.EV_KEY, BTN_TRIGGER, 1), _report())
+    assert device.read()
+    # Stale press is discarded; state is read from device instead.
+    assert device.state.buttons == 0b10
+
+    # Events after the next report are applied again.
+    device.write((lji.EV_KEY, BTN_TRIGGER + 1, 0), _report())
+    assert device.read()
+    assert device.state.buttons == 0
+
+
+def test_dropped_resync_spans_reads(device):
+    device.write((lji.EV_SYN, lji.SYN_DROPPED, 0),
+                 (lji.EV_KEY, BTN_TRIGGER, 1))
+    assert not device.read()
+    device.write(_report())
+    assert not device.read()
+    assert device.state.buttons == 0
+
+
+def test_wall_clock_timestamps_converted_to_monotonic():
+    # Kernel could not be switched to `CLOCK_MONOTONIC`.
+    device = PipeEvdevDevice(monotonic_timestamps=False)
+    try:
+        device.write((lji.EV_KEY, BTN_TRIGGER, 1), _report(),
+                     timestamp=time.time())
+        assert device.read()
+        assert abs(device.state.timestamp - lji.monotonic()) < .1
+    finally:
+        device.close()
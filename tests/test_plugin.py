@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import gc
+import logging
+import threading
+import time
+
+import pytest
+
+from joypad_control_plugin import JoypadControlPlugin
+from fakes import FakeBackend, wait_until
+
+
+@pytest.fixture
+def plugin():
+    plugin = JoypadControlPlugin()
+    plugin.backend = FakeBackend()
+    plugin.backend.plug(0)
+    yield plugin
+    plugin.on_plugin_disable()
+    assert plugin.poller.stop(5.)
+
+
+def test_disable_while_poller_blocked_on_full_queue(plugin, caplog):
+    plugin.dispatch_overflow = 'block'
+    plugin.dispatch_queue_size = 1
+    plugin.shutdown_timeout = 2.
+    received = threading.Event()
+    release = threading.Event()
+
+    def _blocking_receiver(message):
+        received.set()
+        release.wait(10.)
+
+    plugin.on_plugin_enable()
+    plugin.signals.signal('state-changed').connect(_blocking_receiver,
+                                                   weak=False)
+    # Fill the queue, so the poller blocks sending the next change.
+    for i in range(4):
+        plugin.backend.set_state(0, buttons=(i % 2) << 11)
+        time.sleep(.05)
+    assert received.wait(2.)
+    assert wait_until(lambda: plugin.dispatcher.depth == 1)
+
+    # Release the receiver once the poller has stopped.
+    threading.Thread(target=lambda: wait_until(lambda: not
+                                               plugin.poller.running, 10.)
+                     and release.set()).start()
+    start = time.time()
+    with caplog.at_level(logging.WARNING):
+        plugin.on_plugin_disable()
+    assert time.time() - start < 1.
+    assert not [record for record in caplog.records
+                if 'Timed out' in record.getMessage()]
+    assert not plugin.poller.running
+
+
+def _settled_footprint():
+    '''
+    Returns
+    -------
+    tuple
+        Number of active threads and of objects tracked by the garbage
+        collector, once background (e.g., preload) threads have finished.
+    '''
+    wait_until(lambda: not [thread for thread in threading.enumerate()
+                            if thread.name == 'joypad-preload'])
+    gc.collect()
+    return threading.active_count(), len(gc.get_objects())
+
+
+def test_toggle_does_not_leak(plugin):
+    # Preload installed modules, so there are no import errors logged (and
+    # kept by the log capture) on each cycle.
+    plugin.preload_modules = ('json', )
+    for i in range(10):
+        plugin.on_plugin_enable()
+        plugin.on_plugin_disable()
+    threads, objects = _settled_footprint()
+    start = time.time()
+    for i in range(1000):
+        plugin.on_plugin_enable()
+        # Poller, dispatcher and timer threads (and preload thread).
+        assert len(set(plugin.get_runtime_info()['threads']) -
+                   set(['joypad-preload'])) <= 3
+        plugin.on_plugin_disable()
+    elapsed = time.time() - start
+    threads_after, objects_after = _settled_footprint()
+    print('1000 toggles in %.2f s: %d -> %d threads, %d -> %d objects' %
+          (elapsed, threads, threads_after, objects, objects_after))
+    assert threads_after == threads
+    assert not plugin.get_runtime_info()['poller']['running']
+    # Allow for a few objects cached on first use, but not one per cycle.
+    assert objects_after - objects < 500
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    '''
+    Hub commands executed by the plugin, as ``(target, command, kwargs)``.
+    '''
+    import joypad_control_plugin
+
+    calls = []
+
+    def _hub_execute_async(target, command, callback=None, **kwargs):
+        calls.append((target, command, kwargs))
+
+    monkeypatch.setattr(joypad_control_plugin, 'hub_execute_async',
+                        _hub_execute_async)
+    return calls
+
+
+def _commands(hub, command):
+    return [kwargs for target, command_, kwargs in hub if command_ == command]
+
+
+def test_small_deflection_moves_with_small_deadzone(plugin, hub):
+    plugin.deadzone = .3
+    plugin.axis_levels = 4
+    plugin.on_plugin_enable()
+    # Innermost deflection level beyond the deadzone (i.e., zone .35).
+    plugin.backend.set_state(0, axes=(.33, 0.))
+    assert wait_until(lambda: _commands(hub,
+                                        'set_electrode_direction_states'))
+    assert _commands(hub, 'set_electrode_direction_states') == \
+        [{'direction': 'right'}]
+
+
+def test_poll_rates_configurable(plugin):
+    plugin.poll_interval = .002
+    plugin.poll_idle_interval = .05
+    plugin.poll_idle_timeout = .1
+    plugin.on_plugin_enable()
+    assert plugin.get_poll_metrics()['interval'] == .002
+    # Switches to the idle rate once no input changed for .1 s.
+    assert wait_until(lambda: plugin.get_poll_metrics()['idle'], 1.)
+    assert plugin.get_poll_metrics()['interval'] == .05
+
+
+def test_held_direction_repeats_after_lost_reply(plugin, hub):
+    plugin.in_flight.timeout = .1
+    plugin.repeat_delay = .1
+    plugin.on_plugin_enable()
+    # Move right; the electrode controller never replies.
+    plugin.backend.set_state(0, axes=(.5, 0.))
+    assert wait_until(lambda: _commands(hub,
+                                        'set_electrode_direction_states'))
+    plugin.backend.set_state(0, axes=(0., 0.))
+    time.sleep(.05)
+    # Hold left.
+    plugin.backend.set_state(0, axes=(-.5, 0.))
+    time.sleep(1.)
+    directions = [kwargs['direction'] for kwargs in
+                  _commands(hub, 'set_electrode_direction_states')]
+    assert directions[0] == 'right'
+    # Each left is issued once the previous command expired.
+    assert directions[1:] and set(directions[1:]) == set(['left'])
+    assert len(directions) >= 4
+    # Held back repeats are not retried on every timer tick.
+    assert plugin.get_backpressure_metrics()['repeat']['deferred'] < 5
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import trollius as asyncio
+
+from joypad_control_plugin.poller import PollRateGovernor, check_joypads
+from fakes import FakeBackend, PipeBackend, RecordingSignals, wait_until
+
+try:
+    from time import process_time
+except ImportError:
+    # Python 2; `time.clock()` is processor time on Linux.
+    from time import clock as process_time
+
+
+def test_bounded_cpu_while_disconnected(runner):
+    backend = FakeBackend()
+    signals = RecordingSignals()
+    cpu_start, start = process_time(), time.time()
+    runner.run(check_joypads, signals, [0], backend=backend)
+    time.sleep(1.)
+    cpu, elapsed = process_time() - cpu_start, time.time() - start
+    print('Disconnected for %.2f s: %d probes, %.1f%% CPU' %
+          (elapsed, backend.probes[0], 100 * cpu / elapsed))
+    # Probes back off exponentially: .05 + .1 + .2 + .4 s.
+    assert backend.probes[0] <= 6
+    assert cpu < .5 * elapsed
+    assert not signals.sent
+
+    # Plugged in device is picked up within the maximum backoff.
+    backend.plug(0, buttons=0b1)
+    assert signals.wait_for(lambda signals:
+                            signals.messages('state-changed'), 3.)
+    assert signals.messages('device-connected') == [{'device_id': 0}]
+    assert signals.messages('state-changed')[0].new.buttons == 0b1
+
+    backend.unplug(0)
+    assert signals.wait_for(lambda signals:
+                            signals.messages('device-disconnected'))
+    assert runner.cancel(5.)
+    assert wait_until(lambda: backend.closed[0] == backend.opened[0])
+
+
+def test_event_driven_wakes_up_when_idle(runner):
+    backend = PipeBackend()
+    backend.plug(0)
+    backend.plug(1)
+    signals = RecordingSignals()
+    runner.run(check_joypads, signals, [0, 1], backend=backend)
+    assert signals.wait_for(lambda signals:
+                            len(signals.messages('state-changed')) == 2)
+    # Let the poller go idle, i.e., wait for input with no timeout.
+    time.sleep(.1)
+    reads = sum(backend.reads.values())
+    time.sleep(.1)
+    assert sum(backend.reads.values()) == reads
+
+    backend.set_state(1, buttons=0b100)
+    assert signals.wait_for(lambda signals:
+                            len(signals.messages('state-changed')) == 3)
+    message = signals.messages('state-changed')[-1]
+    assert message.device_id == 1
+    assert message.new.buttons == 0b100
+    backend.set_state(0, buttons=0b1)
+    assert signals.wait_for(lambda signals:
+                            len(signals.messages('state-changed')) == 4)
+    assert signals.messages('state-changed')[-1].device_id == 0
+
+
+def _bench_jitter(start, stop, duration=.5):
+    backend = FakeBackend()
+    backend.plug(0)
+    governor = PollRateGovernor()
+    start(check_joypads, RecordingSignals(), [0], backend=backend,
+          governor=governor)
+    time.sleep(duration)
+    stop()
+    return governor.jitter.summary()
+
+
+def test_bench_sleep_jitter(runner):
+    '''
+    Compare poll wake up lateness with the poller on the plugin's long-lived
+    event loop thread against a fresh loop in a bare thread per run (i.e.,
+    before :class:`runner.EventLoopThread`).
+    '''
+    def _start_bare(coroutine_function, *args, **kwargs):
+        def _run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            task = loop.create_task(coroutine_function(*args, **kwargs))
+            bare['cancel'] = lambda: loop.call_soon_threadsafe(task.cancel)
+            started.set()
+            try:
+                loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                pass
+            finally:
+                loop.close()
+
+        started = threading.Event()
+        bare['thread'] = threading.Thread(target=_run)
+        bare['thread'].daemon = True
+        bare['thread'].start()
+        started.wait(5.)
+
+    def _stop_bare():
+        bare['cancel']()
+        bare['thread'].join(5.)
+
+    bare = {}
+    results = {'bare thread': _bench_jitter(_start_bare, _stop_bare),
+               'loop thread': _bench_jitter(runner.run,
+                                            lambda: runner.cancel(5.))}
+    for name, summary in sorted(results.items()):
+        print('%-11s %5d polls, jitter p50 %.3f ms, p99 %.3f ms, '
+              'max %.3f ms' % (name, summary['count'],
+                               1e3 * summary['p50'], 1e3 * summary['p99'],
+                               1e3 * summary['max']))
+    assert not bare['thread'].is_alive()
+    for summary in results.values():
+        # 1 ms poll interval for .5 s.
+        assert summary['count'] > 50
+        assert summary['p50'] < .05
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+#: Modules that must not be imported to register the plugin.
+HEAVY_MODULES = ('pandas', 'deepdiff', 'blinker', 'zmq_plugin.schema',
+                 'asyncio_helpers', 'trollius')
+#: Maximum seconds to import the plugin package (importing pandas alone
+#: takes several hundred milliseconds).
+MAX_IMPORT_SECONDS = .25
+#: Marker written to stderr before importing the plugin package, so the
+#: `-X importtime` lines of the package imports can be told apart.
+MARKER = 'joypad-control-plugin-import'
+
+_SCRIPT = '''
+import json
+import sys
+import time
+
+sys.path.insert(0, %(tests)r)
+import stand_ins
+
+sys.stderr.write(%(marker)r + '\\n')
+sys.stderr.flush()
+start = time.time()
+stand_ins.install()
+seconds = time.time() - start
+print(json.dumps({'seconds': seconds,
+                  'imported': [name for name in %(heavy)r
+                               if name in sys.modules]}))
+'''
+
+
+def _import_times(stderr):
+    '''
+    Returns
+    -------
+    list
+        ``(cumulative seconds, module)`` of each module imported by the
+        plugin package, slowest first.
+    '''
+    lines = stderr.splitlines()
+    times = []
+    for line in lines[lines.index(MARKER) + 1:]:
+        if not line.startswith('import time:'):
+            continue
+        self_, cumulative, module = line[len('import time:'):].split('|')
+        try:
+            times.append((int(cumulative) * 1e-6, module.strip()))
+        except ValueError:
+            # Header.
+            continue
+    return sorted(times, reverse=True)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7),
+                    reason='`-X importtime` requires Python 3.7')
+def test_bench_startup():
+    '''
+    Import the plugin package in a fresh interpreter and report the import
+    time (and slowest imports, from ``python -X importtime``).
+    '''
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c',
+                                _SCRIPT % {'tests': TESTS, 'marker': MARKER,
+                                           'heavy': HEAVY_MODULES}],
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               universal_newlines=True)
+    stdout, stderr = process.communicate()
+    assert process.returncode == 0, stderr
+    result = json.loads(stdout)
+    print('Plugin import: %.1f ms' % (1e3 * result['seconds']))
+    for seconds, module in _import_times(stderr)[:5]:
+        print('  %6.1f ms %s' % (1e3 * seconds, module))
+    assert result['imported'] == []
+    assert result['seconds'] < MAX_IMPORT_SECONDS
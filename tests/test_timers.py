@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from joypad_control_plugin.timers import AutoRepeat, TimerWheel
+from fakes import wait_until
+
+
+@pytest.fixture
+def wheel():
+    wheel = TimerWheel()
+    wheel.start()
+    yield wheel
+    assert wheel.stop(5.)
+
+
+def test_deferred_repeat_waits_for_resume(wheel):
+    ready = threading.Event()
+    repeats = []
+    repeater = AutoRepeat(wheel, initial_delay=.01, min_rate=4., max_rate=4.,
+                          ready=ready.is_set)
+    repeater.hold('right', 1., lambda: repeats.append(time.time()))
+    time.sleep(.3)
+    # Due repeat is checked again once per repeat interval, rather than on
+    # every tick.
+    assert not repeats
+    assert 1 <= repeater.deferred <= 3
+    ready.set()
+    start = time.time()
+    repeater.resume()
+    assert wait_until(lambda: repeats, 1.)
+    assert repeats[0] - start < .05
+    repeater.release_all()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import timeit
+
+import pytest
+
+from joypad_control_plugin import windows_joypad_interface as wji
+from fakes import FakeWinMM
+
+POLLS = 10000
+
+
+@pytest.fixture
+def winmm():
+    winmm = FakeWinMM()
+    wji.use_winmm(winmm)
+    winmm.plug(0)
+    return winmm
+
+
+def test_caps_cached_per_device(winmm):
+    wji.get_state(0)
+    wji.get_state(0)
+    assert winmm.calls['joyGetDevCapsW'] == 1
+
+
+def test_caps_invalidated_when_unplugged(winmm):
+    wji.get_state(0)
+    winmm.unplug(0)
+    with pytest.raises(IOError):
+        wji.get_state(0)
+    winmm.num_buttons = 4
+    winmm.plug(0, buttons=0b1000)
+    assert wji.get_state(0)['button_states'] == [False, False, False, True]
+    assert winmm.calls['joyGetDevCapsW'] == 2
+
+
+def test_reader_reuses_buffer(winmm):
+    backend = wji.WinMMBackend(winmm=winmm)
+    device = backend.open(0)
+    state = device.state
+    assert not device.read()
+    assert device.state is state
+    winmm.devices[0]['buttons'] = 1
+    assert device.read()
+    assert device.state.is_pressed(0)
+
+
+def test_bench_calls_per_poll(winmm):
+    '''
+    Compare WinMM calls (and time) per poll with capabilities cached per
+    device against querying capabilities on every poll (i.e., before
+    capabilities were cached).
+    '''
+    results = {}
+    for name, poll in (('uncached', lambda: wji.get_state(
+                           0, caps=wji.joyGetDevCaps(0))),
+                       ('cached', lambda: wji.get_state(0)),
+                       ('reader', wji.WinMMBackend(winmm=winmm)
+                        .open(0).read)):
+        poll()
+        winmm.calls.clear()
+        seconds = timeit.timeit(poll, number=POLLS)
+        results[name] = (sum(winmm.calls.values()) / float(POLLS),
+                         1e6 * seconds / POLLS)
+    for name, (calls, microseconds) in sorted(results.items()):
+        print('%-8s %.2f WinMM calls/poll, %.2f us/poll' %
+              (name, calls, microseconds))
+    assert results['uncached'][0] == 2
+    assert results['cached'][0] == 1
+    assert results['reader'][0] == 1
+
+
+@pytest.mark.parametrize('flags, axis_names, num_buttons', [
+    (wji.DEFAULT_EX_FLAGS, ('x', 'y'), 12),
+    # R, U and V are not supported by the device.
+    (wji.JOY_RETURNALL, ('x', 'y', 'z') + wji.POV_AXIS_NAMES, 12),
+    (wji.JOY_RETURNX | wji.JOY_RETURNZ, ('x', 'z'), 0),
+    (wji.JOY_RETURNR | wji.JOY_RETURNPOVCTS | wji.JOY_RETURNBUTTONS,
+     wji.POV_AXIS_NAMES, 12)])
+def test_reader_ex_layout(winmm, flags, axis_names, num_buttons):
+    winmm.caps = wji.JOYCAPS_HASZ | wji.JOYCAPS_HASPOV
+    # Z fully deflected, hat pushed right.
+    winmm.plug(0, z=65535, pov=9000, buttons=0b101)
+    state = wji.WinMMBackend(flags, winmm=winmm).open(0).state
+    assert state.axis_names == axis_names
+    assert state.num_buttons == num_buttons
+    assert state.buttons == (0b101 if num_buttons else 0)
+    expected = {'x': 0., 'y': 0., 'z': .5, 'pov_x': .5, 'pov_y': 0.}
+    assert state.axes == pytest.approx([expected[name]
+                                        for name in axis_names], abs=1e-4)
+
+
+def test_reader_ex_reads_pov(winmm):
+    winmm.caps = wji.JOYCAPS_HASPOV
+    device = wji.WinMMBackend(wji.JOY_RETURNALL, winmm=winmm).open(0)
+    assert device.state.axis_names == ('x', 'y') + wji.POV_AXIS_NAMES
+    # Hat centered.
+    assert device.state.axes[2:] == (0., 0.)
+    assert not device.read()
+    # Hat pushed forward.
+    winmm.devices[0]['pov'] = 0
+    assert device.read()
+    assert device.state.axes[2:] == (0., -.5)
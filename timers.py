@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+import math
+import threading
+
+from logging_helpers import _L
+
+from .joypad_state import monotonic
+
+
+class Timer(object):
+    '''
+    Handle of a callback scheduled on a :class:`TimerWheel`.
+    '''
+    __slots__ = ('deadline', 'callback', 'rounds', 'cancelled')
+
+    def __init__(self, deadline, callback, rounds):
+        self.deadline = deadline
+        self.callback = callback
+        self.rounds = rounds
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel(object):
+    '''
+    Hashed timing wheel driven by a single thread.
+
+    Timers are hashed into :attr:`slots` buckets of :attr:`tick` seconds
+    each, so scheduling and cancelling are O(1) regardless of the number of
+    pending timers, and all timers share one thread.  Timers fire on the
+    first tick at or after their deadline, i.e., with a resolution of
+    :attr:`tick`.  The thread sleeps while no timers are pending.
+
+    Parameters
+    ----------
+    tick : float, optional
+        Seconds per slot.
+    slots : int, optional
+        Number of slots (one revolution is ``tick * slots`` seconds; longer
+        delays wait for multiple revolutions).
+    '''
+    def __init__(self, tick=.005, slots=256):
+        self.tick = tick
+        self.slots = slots
+        self._wheel = [[] for i in range(slots)]
+        self._cursor = 0
+        self._tick_time = None
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    @property
+    def pending(self):
+        '''
+        Number of scheduled timers (including cancelled timers not yet
+        reached by the wheel).
+        '''
+        return self._pending
+
+    def start(self):
+        if self.is_alive():
+            raise RuntimeError('Wheel thread is already running.')
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run,
+                                        name='joypad-timers')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def is_alive(self):
+        '''
+        Returns
+        -------
+        bool
+            ``True`` if wheel thread is running.
+        '''
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=None):
+        '''
+        Stop wheel thread, discarding pending timers.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum seconds to wait for wheel thread to finish.
+
+        Returns
+        -------
+        bool
+            ``True`` if wheel thread has finished.
+        '''
+        with self._condition:
+            self._stopped = True
+            for slot in self._wheel:
+                del slot[:]
+            self._pending = 0
+            self._condition.notify_all()
+        if (self._thread is not None and
+                self._thread is not threading.current_thread()):
+            self._thread.join(timeout)
+        if self.is_alive():
+            return False
+        self._thread = None
+        return True
+
+    def schedule(self, delay, callback):
+        '''
+        Parameters
+        ----------
+        delay : float
+            Seconds until callback is called.
+        callback : function
+            Called with no arguments from the wheel thread.
+
+        Returns
+        -------
+        Timer
+            Timer handle (see :meth:`Timer.cancel`).
+        '''
+        now = monotonic()
+        with self._condition:
+            if self._tick_time is None:
+                # Wheel is idle; start ticking from now.
+                self._tick_time = now
+            # Ticks from the most recent processed tick.
+            ticks = max(1, int(math.ceil((now + delay - self._tick_time) /
+                                         self.tick - 1e-9)))
+            rounds, offset = divmod(ticks - 1, self.slots)
+            timer = Timer(now + delay, callback, rounds)
+            self._wheel[(self._cursor + 1 + offset) % self.slots]\
+                .append(timer)
+            self._pending += 1
+            self._condition.notify_all()
+        return timer
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._tick_time = None
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                delay = self._tick_time + self.tick - monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                self._tick_time += self.tick
+                self._cursor = (self._cursor + 1) % self.slots
+                slot = self._wheel[self._cursor]
+                due = []
+                remaining = []
+                for timer in slot:
+                    if timer.cancelled:
+                        self._pending -= 1
+                    elif timer.rounds > 0:
+                        timer.rounds -= 1
+                        remaining.append(timer)
+                    else:
+                        self._pending -= 1
+                        due.append(timer)
+                slot[:] = remaining
+            for timer in due:
+                if timer.cancelled:
+                    continue
+                try:
+                    timer.callback()
+                except Exception:
+                    _L().info('Error in timer callback.', exc_info=True)
+
+
+class AutoRepeat(object):
+    '''
+    Repeat actions while inputs are held, on a shared :class:`TimerWheel`.
+
+    The first repeat fires :attr:`initial_delay` seconds after an input is
+    held; subsequent repeats fire at a rate between :attr:`min_rate` and
+    :attr:`max_rate`, proportional to the input magnitude (e.g., analog
+    stick deflection beyond the deadzone).
+
+    If :data:`ready` returns ``False`` when a repeat is due (e.g., the
+    target is still executing the previous command), the repeat is held
+    back until :meth:`resume` is called (e.g., once the target replies), or
+    checked again after another repeat interval, so repeats never queue up
+    faster than they can be executed.
+
+    Parameters
+    ----------
+    wheel : TimerWheel
+        Timer wheel to schedule repeats on.
+    initial_delay : float, optional
+        Seconds an input must be held before the first repeat.
+    min_rate : float, optional
+        Repeats per second at the smallest magnitude.
+    max_rate : float, optional
+        Repeats per second at full magnitude.
+    ready : function, optional
+        Called with no arguments; return ``False`` to hold back due repeats.
+    '''
+    def __init__(self, wheel, initial_delay=.4, min_rate=2., max_rate=10.,
+                 ready=None):
+        self.wheel = wheel
+        self.initial_delay = initial_delay
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.ready = ready
+        self._held = {}
+        self._lock = threading.Lock()
+        #: Number of repeats fired.
+        self.repeats = 0
+        #: Number of times a due repeat was held back.
+        self.deferred = 0
+
+    def interval(self, magnitude):
+        '''
+        Parameters
+        ----------
+        magnitude : float
+            Input magnitude in range ``[0, 1]``.
+
+        Returns
+        -------
+        float
+            Seconds between repeats.
+        '''
+        magnitude = min(1., max(0., magnitude))
+        return 1. / (self.min_rate + (self.max_rate - self.min_rate) *
+                     magnitude)
+
+    def hold(self, key, magnitude, callback):
+        '''
+        Start repeating :data:`callback` (or update the magnitude, if
+        :data:`key` is already held).
+
+        Parameters
+        ----------
+        key : hashable
+            Input identifier, e.g., ``(device_id, 'direction')``.
+        magnitude : float
+            Input magnitude in range ``[0, 1]``.
+        callback : function
+            Called with no arguments on each repeat (from the wheel thread).
+        '''
+        with self._lock:
+            held = self._held.get(key)
+            if held is not None:
+                held[0] = magnitude
+                held[1] = callback
+                return
+            # Magnitude, callback, timer and whether repeat is held back.
+            held = [magnitude, callback, None, False]
+            self._held[key] = held
+            self._schedule(key, held, self.initial_delay)
+
+    def update(self, key, magnitude):
+        '''
+        Update magnitude of held input.
+
+        Returns
+        -------
+        bool
+            ``True`` if :data:`key` is held.
+        '''
+        with self._lock:
+            held = self._held.get(key)
+            if held is None:
+                return False
+            held[0] = magnitude
+            return True
+
+    def release(self, key):
+        with self._lock:
+            held = self._held.pop(key, None)
+            if held is not None:
+                held[2].cancel()
+
+    def release_all(self):
+        with self._lock:
+            for held in self._held.values():
+                held[2].cancel()
+            self._held.clear()
+
+    def resume(self):
+        '''
+        Retry held back repeats on the next tick, e.g., once the target has
+        acknowledged the previous command.
+        '''
+        with self._lock:
+            for key, held in self._held.items():
+                if held[3]:
+                    held[3] = False
+                    held[2].cancel()
+                    self._schedule(key, held, 0)
+
+    def _schedule(self, key, held, delay):
+        held[2] = self.wheel.schedule(delay, lambda: self._fire(key, held))
+
+    def _fire(self, key, held):
+        with self._lock:
+            if self._held.get(key) is not held:
+                # Released (or released and held again) since scheduled.
+                return
+            interval = self.interval(held[0])
+            if self.ready is not None and not self.ready():
+                # Retry once resumed, or after another interval at the
+                # latest (e.g., if the previous command expired without a
+                # reply).
+                self.deferred += 1
+                held[3] = True
+                self._schedule(key, held, interval)
+                return
+            held[3] = False
+            self.repeats += 1
+            callback = held[1]
+            self._schedule(key, held, interval)
+        callback()
+
+    def metrics(self):
+        '''
+        Returns
+        -------
+        dict
+            Number of ``held`` inputs, ``repeats`` fired and ``deferred``
+            repeats.
+        '''
+        return {'held': len(self._held), 'repeats': self.repeats,
+                'deferred': self.deferred}
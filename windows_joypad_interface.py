@@ -3,12 +3,20 @@
 # http://msdn.microsoft.com/en-us/library/windows/desktop/dd757116(v=vs.85).aspx
 from __future__ import division, print_function
 import ctypes
-import _winreg as winreg
+import math
+try:
+    import _winreg as winreg
+except ImportError:
+    try:
+        import winreg
+    except ImportError:
+        # Not on Windows (see `use_winmm()`).
+        winreg = None
 from ctypes.wintypes import WORD, UINT, DWORD
 from ctypes.wintypes import WCHAR as TCHAR
 
-# Fetch function pointers
-joyGetNumDevs = ctypes.windll.winmm.joyGetNumDevs
+from .backends import JoypadBackend, JoypadDevice
+from .joypad_state import JoypadState, axis_factors, monotonic
 
 # Define constants
 MAXPNAMELEN = 32
@@ -29,6 +37,29 @@ JOY_USEDEADZONE = 0x800
 JOY_RETURNALL = (JOY_RETURNX | JOY_RETURNY | JOY_RETURNZ | JOY_RETURNR |
                  JOY_RETURNU | JOY_RETURNV | JOY_RETURNPOV | JOY_RETURNBUTTONS)
 
+JOY_POVCENTERED = 0xFFFF
+
+JOYCAPS_HASZ = 0x1
+JOYCAPS_HASR = 0x2
+JOYCAPS_HASU = 0x4
+JOYCAPS_HASV = 0x8
+JOYCAPS_HASPOV = 0x10
+
+#: Default flags for :class:`JoypadReaderEx`, i.e., X/Y axes and all buttons.
+DEFAULT_EX_FLAGS = JOY_RETURNX | JOY_RETURNY | JOY_RETURNBUTTONS
+
+# Axes returned by `joyGetPosEx`, as `(axis name, return flag, capability
+# flag, JOYINFOEX field, JOYCAPS min field, JOYCAPS max field)`.
+EX_AXES = (('x', JOY_RETURNX, 0, 'dwXpos', 'wXmin', 'wXmax'),
+           ('y', JOY_RETURNY, 0, 'dwYpos', 'wYmin', 'wYmax'),
+           ('z', JOY_RETURNZ, JOYCAPS_HASZ, 'dwZpos', 'wZmin', 'wZmax'),
+           ('r', JOY_RETURNR, JOYCAPS_HASR, 'dwRpos', 'wRmin', 'wRmax'),
+           ('u', JOY_RETURNU, JOYCAPS_HASU, 'dwUpos', 'wUmin', 'wUmax'),
+           ('v', JOY_RETURNV, JOYCAPS_HASV, 'dwVpos', 'wVmin', 'wVmax'))
+
+#: Names of axes that report the point-of-view hat position.
+POV_AXIS_NAMES = ('pov_x', 'pov_y')
+
 # Define some structures from WinMM that we will use in function calls.
 class JOYCAPS(ctypes.Structure):
     _fields_ = [
@@ -90,8 +121,7 @@ def joyGetPos(joy_id, info=None):
         info = JOYINFO()
     else:
         inplace=True
-    p_info = ctypes.pointer(info)
-    if ctypes.windll.winmm.joyGetPos(joy_id, p_info) != 0:
+    if _joyGetPos(joy_id, ctypes.byref(info)) != 0:
         raise IOError("Joystick %d not plugged in." % joy_id)
     if not inplace:
         return info
@@ -103,13 +133,123 @@ def joyGetDevCaps(joy_id, caps=None):
         caps = JOYCAPS()
     else:
         inplace=True
-    p_caps = ctypes.pointer(caps)
-    if ctypes.windll.winmm.joyGetDevCapsW(joy_id, p_caps,
-                                          ctypes.sizeof(JOYCAPS)) != 0:
+    if _joyGetDevCapsW(joy_id, ctypes.byref(caps),
+                       ctypes.sizeof(JOYCAPS)) != 0:
         raise IOError('Failed to get device capabilities.')
     if not inplace:
         return caps
 
+
+class DeviceCaps(object):
+    '''
+    Device capabilities with precomputed axis scale/offset factors.
+
+    Attributes
+    ----------
+    caps : JOYCAPS
+        Raw capabilities structure returned by :func:`joyGetDevCaps`.
+    num_buttons : int
+        Number of buttons reported by the device.
+    x_factors, y_factors : tuple
+        ``(scale, offset)`` pair for remapping raw axis positions to floats in
+        the range ``[-0.5, 0.5]``.
+    factors : dict
+        ``(scale, offset)`` pair of each axis supported by the device, keyed
+        by axis name (see :data:`EX_AXES`).
+    has_pov : bool
+        ``True`` if the device has a point-of-view hat.
+    '''
+    __slots__ = ('caps', 'num_buttons', 'x_factors', 'y_factors', 'factors',
+                 'has_pov')
+
+    def __init__(self, caps):
+        self.caps = caps
+        self.num_buttons = caps.wNumButtons
+        self.factors = {name: axis_factors(getattr(caps, min_field),
+                                           getattr(caps, max_field))
+                        for name, _, caps_flag, _, min_field, max_field
+                        in EX_AXES if not caps_flag or caps.wCaps & caps_flag}
+        self.x_factors = self.factors['x']
+        self.y_factors = self.factors['y']
+        self.has_pov = bool(caps.wCaps & JOYCAPS_HASPOV)
+
+
+# Capabilities of each device, keyed by joystick id.
+#
+# Capabilities never change while a device is plugged in, so they are only
+# queried once per connection.  Entries are dropped by
+# :func:`invalidate_caps` when a device read fails (e.g., device unplugged).
+_caps_cache = {}
+
+
+def get_caps(joy_id):
+    '''
+    Get cached capabilities of joystick, querying the device on first use.
+
+    Parameters
+    ----------
+    joy_id : int
+        Joystick identifier.
+
+    Returns
+    -------
+    DeviceCaps
+        Device capabilities with precomputed axis scale factors.
+
+    Raises
+    ------
+    IOError
+        If device capabilities could not be read.
+    '''
+    try:
+        return _caps_cache[joy_id]
+    except KeyError:
+        caps = DeviceCaps(joyGetDevCaps(joy_id))
+        _caps_cache[joy_id] = caps
+        return caps
+
+
+def invalidate_caps(joy_id=None):
+    '''
+    Drop cached capabilities so they are re-read on next access.
+
+    Parameters
+    ----------
+    joy_id : int, optional
+        Joystick identifier.  If not specified, drop cached capabilities of
+        all devices.
+    '''
+    if joy_id is None:
+        _caps_cache.clear()
+    else:
+        _caps_cache.pop(joy_id, None)
+
+
+def use_winmm(winmm):
+    '''
+    Fetch function pointers from WinMM library.
+
+    Parameters
+    ----------
+    winmm : ctypes.WinDLL
+        WinMM library, or an object providing the same joystick functions
+        (e.g., a fake library to exercise this module on other platforms).
+    '''
+    global joyGetNumDevs, _joyGetPos, _joyGetPosEx, _joyGetDevCapsW
+
+    joyGetNumDevs = winmm.joyGetNumDevs
+    _joyGetPos = winmm.joyGetPos
+    _joyGetPosEx = winmm.joyGetPosEx
+    _joyGetDevCapsW = winmm.joyGetDevCapsW
+    invalidate_caps()
+
+
+# Fetch function pointers.  On other platforms, `use_winmm()` must be called
+# with a stand-in library before reading joysticks.
+if hasattr(ctypes, 'windll'):
+    use_winmm(ctypes.windll.winmm)
+
+
 def get_name(joy_id, caps):
     try:
         key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, "System\\CurrentControlSet\\Control\\MediaResources\\Joystick\\%s\\CurrentJoystickSettings" % (caps.szRegKey))
@@ -127,19 +267,337 @@ def get_name(joy_id, caps):
     return oem_name[0].strip()
 
 def get_state(joy_id, info=None, caps=None):
-    if info is None:
-        info = joyGetPos(joy_id)
-    else:
-        joyGetPos(joy_id, info)
+    '''
+    Read state of joystick.
+
+    Parameters
+    ----------
+    joy_id : int
+        Joystick identifier.
+    info : JOYINFO, optional
+        Structure to fill in place.  If not specified, a new structure is
+        allocated.
+    caps : DeviceCaps or JOYCAPS, optional
+        Device capabilities.  If not specified, cached capabilities are used
+        (see :func:`get_caps`).
+
+    Returns
+    -------
+    dict
+        ``axes`` (``x`` and ``y`` remapped to float in range ``[-0.5, 0.5]``)
+        and ``button_states`` (list of ``bool``).
+
+    Raises
+    ------
+    IOError
+        If joystick is not plugged in.  Cached capabilities of the joystick
+        are invalidated, since a different device may be plugged in next.
+    '''
+    try:
+        if info is None:
+            info = joyGetPos(joy_id)
+        else:
+            joyGetPos(joy_id, info)
+    except IOError:
+        invalidate_caps(joy_id)
+        raise
 
     if caps is None:
-        caps = joyGetDevCaps(joy_id)
+        caps = get_caps(joy_id)
+    elif isinstance(caps, JOYCAPS):
+        caps = DeviceCaps(caps)
+
+    return state_from_raw(info.wXpos, info.wYpos, info.wButtons, caps)
 
+
+def state_from_raw(x_pos, y_pos, buttons, caps):
+    '''
+    Build state dictionary from raw joystick position words.
+
+    Parameters
+    ----------
+    x_pos, y_pos : int
+        Raw axis positions.
+    buttons : int
+        Raw button word (bit ``b`` is set if button ``b`` is pressed).
+    caps : DeviceCaps
+        Device capabilities.
+
+    Returns
+    -------
+    dict
+        See :func:`get_state`.
+    '''
     # Remap axes to float in range [-0.5, 0.5]
-    axes = {'x': (info.wXpos - caps.wXmin) / (caps.wXmax - caps.wXmin) - .5,
-            'y': (info.wYpos - caps.wYmin) / (caps.wYmax - caps.wYmin) - .5}
+    x_scale, x_offset = caps.x_factors
+    y_scale, y_offset = caps.y_factors
+    axes = {'x': x_pos * x_scale + x_offset,
+            'y': y_pos * y_scale + y_offset}
 
-    button_states = [(0 != (1 << b) & info.wButtons)
-                     for b in range(caps.wNumButtons)]
+    button_states = [(0 != (1 << b) & buttons)
+                     for b in range(caps.num_buttons)]
 
     return {'axes': axes, 'button_states': button_states}
+
+
+class JoypadReader(JoypadDevice):
+    '''
+    Steady-state reader for a single joystick.
+
+    The ``JOYINFO`` buffer and the reference passed to WinMM are allocated
+    once and filled in place on every :meth:`read`.  A new
+    :class:`JoypadState` is only built when the raw position/button words
+    change, so polling an idle joystick does not allocate Python objects.
+
+    Parameters
+    ----------
+    joy_id : int
+        Joystick identifier.
+
+    Attributes
+    ----------
+    device_id : int
+        Joystick identifier.
+    state : JoypadState or None
+        Most recent state, or ``None`` if the joystick has not been read
+        successfully yet.
+    '''
+    __slots__ = ('device_id', 'info', 'state', '_p_info', '_x_pos', '_y_pos',
+                 '_buttons')
+
+    def __init__(self, joy_id):
+        self.device_id = joy_id
+        self.info = JOYINFO()
+        self._p_info = ctypes.byref(self.info)
+        self.reset()
+
+    def reset(self):
+        '''
+        Forget last read state, e.g., after the joystick was unplugged.
+        '''
+        self.state = None
+        self._x_pos = self._y_pos = self._buttons = None
+
+    def read(self):
+        '''
+        Read joystick into preallocated buffer.
+
+        Returns
+        -------
+        bool
+            ``True`` if :attr:`state` was updated, i.e., raw words changed
+            since the previous read.
+
+        Raises
+        ------
+        IOError
+            If joystick is not plugged in.
+        '''
+        if _joyGetPos(self.device_id, self._p_info) != 0:
+            invalidate_caps(self.device_id)
+            self.reset()
+            raise IOError("Joystick %d not plugged in." % self.device_id)
+        info = self.info
+        if (info.wButtons == self._buttons and info.wXpos == self._x_pos and
+                info.wYpos == self._y_pos):
+            return False
+        self._x_pos = x_pos = info.wXpos
+        self._y_pos = y_pos = info.wYpos
+        self._buttons = buttons = info.wButtons
+        caps = get_caps(self.device_id)
+        x_scale, x_offset = caps.x_factors
+        y_scale, y_offset = caps.y_factors
+        self.state = JoypadState(buttons, (x_pos * x_scale + x_offset,
+                                           y_pos * y_scale + y_offset),
+                                 caps.num_buttons, monotonic())
+        return True
+
+
+def pov_axes(pov):
+    '''
+    Convert point-of-view hat position to a pair of axis values.
+
+    Parameters
+    ----------
+    pov : int
+        Hat position in hundredths of degrees clockwise from forward, or
+        :data:`JOY_POVCENTERED`.
+
+    Returns
+    -------
+    tuple
+        ``(x, y)`` in range ``[-0.5, 0.5]``, using the same directions as the
+        X/Y axes (i.e., forward is negative ``y``).
+    '''
+    if pov == JOY_POVCENTERED or pov > 36000:
+        return 0., 0.
+    angle = math.radians(pov / 100)
+    # Add zero to normalize `-0.0`.
+    return (round(.5 * math.sin(angle), 6) + 0.,
+            round(-.5 * math.cos(angle), 6) + 0.)
+
+
+class JoypadReaderEx(JoypadDevice):
+    '''
+    Steady-state reader using ``joyGetPosEx``.
+
+    Reads the selected axes (X, Y, Z, R, U, V), the point-of-view hat and up
+    to 32 buttons with a single call into a preallocated ``JOYINFOEX``
+    buffer.  As with :class:`JoypadReader`, a new :class:`JoypadState` is
+    only built when one of the selected raw words changes.
+
+    Axes are named as in :data:`EX_AXES`; the hat is reported as the
+    :data:`POV_AXIS_NAMES` axes (see :func:`pov_axes`).  Axes that are
+    requested but not supported by the device are omitted.
+
+    Parameters
+    ----------
+    joy_id : int
+        Joystick identifier.
+    flags : int, optional
+        ``JOY_RETURN*`` flags selecting what to read (default:
+        :data:`DEFAULT_EX_FLAGS`).
+
+    Attributes
+    ----------
+    device_id : int
+        Joystick identifier.
+    state : JoypadState or None
+        Most recent state, or ``None`` if the joystick has not been read
+        successfully yet.
+    '''
+    __slots__ = ('device_id', 'flags', 'info', 'state', '_p_info', '_fields',
+                 '_raw', '_layout')
+
+    def __init__(self, joy_id, flags=DEFAULT_EX_FLAGS):
+        self.device_id = joy_id
+        self.flags = flags
+        self.info = JOYINFOEX()
+        self.info.dwSize = ctypes.sizeof(JOYINFOEX)
+        self.info.dwFlags = flags
+        self._p_info = ctypes.byref(self.info)
+        # Raw fields to compare between reads.
+        self._fields = tuple(field for _, flag, _, field, _, _ in EX_AXES
+                             if flags & flag)
+        if flags & JOY_RETURNBUTTONS:
+            self._fields += ('dwButtons', )
+        if flags & (JOY_RETURNPOV | JOY_RETURNPOVCTS):
+            self._fields += ('dwPOV', )
+        self.reset()
+
+    def reset(self):
+        '''
+        Forget last read state, e.g., after the joystick was unplugged.
+        '''
+        self.state = None
+        self._raw = [None] * len(self._fields)
+        self._layout = None
+
+    def _get_layout(self):
+        '''
+        Returns
+        -------
+        tuple
+            ``(axis names, [(JOYINFOEX field, scale, offset), ...], include
+            POV, number of buttons)`` for selected flags and device
+            capabilities.
+        '''
+        caps = get_caps(self.device_id)
+        names = []
+        axes = []
+        for name, flag, _, field, _, _ in EX_AXES:
+            if self.flags & flag and name in caps.factors:
+                names.append(name)
+                axes.append((field, ) + caps.factors[name])
+        pov = bool(self.flags & (JOY_RETURNPOV | JOY_RETURNPOVCTS) and
+                   caps.has_pov)
+        if pov:
+            names.extend(POV_AXIS_NAMES)
+        num_buttons = (caps.num_buttons if self.flags & JOY_RETURNBUTTONS
+                       else 0)
+        return tuple(names), axes, pov, num_buttons
+
+    def read(self):
+        '''
+        Read joystick into preallocated buffer.
+
+        Returns
+        -------
+        bool
+            ``True`` if :attr:`state` was updated, i.e., selected raw words
+            changed since the previous read.
+
+        Raises
+        ------
+        IOError
+            If joystick is not plugged in.
+        '''
+        if _joyGetPosEx(self.device_id, self._p_info) != 0:
+            invalidate_caps(self.device_id)
+            self.reset()
+            raise IOError("Joystick %d not plugged in." % self.device_id)
+        info = self.info
+        fields = self._fields
+        raw = self._raw
+        changed = False
+        for i in range(len(fields)):
+            value = getattr(info, fields[i])
+            if value != raw[i]:
+                raw[i] = value
+                changed = True
+        if not changed:
+            return False
+        if self._layout is None:
+            self._layout = self._get_layout()
+        names, axes, pov, num_buttons = self._layout
+        values = [getattr(info, field) * scale + offset
+                  for field, scale, offset in axes]
+        if pov:
+            values.extend(pov_axes(info.dwPOV))
+        buttons = info.dwButtons if num_buttons else 0
+        self.state = JoypadState(buttons, tuple(values), num_buttons,
+                                 monotonic(), names)
+        return True
+
+
+class WinMMBackend(JoypadBackend):
+    '''
+    Polling backend using the WinMM joystick API.
+
+    Parameters
+    ----------
+    flags : int, optional
+        ``JOY_RETURN*`` flags selecting what :class:`JoypadReaderEx` reads
+        (default: :data:`DEFAULT_EX_FLAGS`).  If ``None``, devices are read
+        with the legacy ``joyGetPos`` call (X/Y axes and 4 buttons only; see
+        :class:`JoypadReader`).
+    winmm : object, optional
+        Stand-in for the WinMM library (see :func:`use_winmm`).
+    '''
+    event_driven = False
+
+    def __init__(self, flags=DEFAULT_EX_FLAGS, winmm=None):
+        if winmm is not None:
+            use_winmm(winmm)
+        self.flags = flags
+        # Scratch buffer for probing devices.
+        self._info = JOYINFO()
+        self._p_info = ctypes.byref(self._info)
+
+    def enumerate(self):
+        return [joy_id for joy_id in range(joyGetNumDevs())
+                if _joyGetPos(joy_id, self._p_info) == 0]
+
+    def is_available(self, device_id):
+        return (device_id < joyGetNumDevs() and
+                _joyGetPos(device_id, self._p_info) == 0)
+
+    def open(self, device_id):
+        # Device may have been replaced since it was last opened.
+        invalidate_caps(device_id)
+        if self.flags is None:
+            device = JoypadReader(device_id)
+        else:
+            device = JoypadReaderEx(device_id, self.flags)
+        device.read()
+        return device